@@ -0,0 +1,7 @@
+""" Offline benchmarks for achallonge
+
+Run them from the repository root with::
+
+    python -m benchmarks -o results.json
+
+"""
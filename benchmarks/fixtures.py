@@ -0,0 +1,52 @@
+""" Synthetic Challonge payloads, built with the in-memory store of :class:`challonge.fake.FakeServer` """
+import copy
+
+from challonge.fake import FakeServer
+
+
+_cache = {}
+
+
+def populate(server: FakeServer, participants_count: int, tournament_type: str = 'single elimination',
+             completed_ratio: float = .5, url: str = None) -> str:
+    """ create a started tournament in `server` and return its id
+
+    `completed_ratio` of the matches are reported, in bracket order
+    """
+    created = server.dispatch('POST', ['tournaments'], {'tournament': {
+        'name': 'bench', 'url': url or 'bench_{}'.format(participants_count), 'tournament_type': tournament_type}})
+    t_id = str(created['tournament']['id'])
+    server.dispatch('POST', ['tournaments', t_id, 'participants', 'bulk_add'],
+                    {'participants': [{'name': 'player {}'.format(i)} for i in range(participants_count)]})
+    server.dispatch('POST', ['tournaments', t_id, 'start'], {})
+
+    to_report = int(len(server.matches[int(t_id)]) * completed_ratio)
+    for m in server.matches[int(t_id)]:
+        if to_report == 0:
+            break
+        if m['player1_id'] is not None and m['player2_id'] is not None:
+            server.dispatch('PUT', ['tournaments', t_id, 'matches', str(m['id'])],
+                            {'match': {'scores_csv': '2-1', 'winner_id': str(m['player1_id'])}})
+            to_report -= 1
+    return t_id
+
+
+def tournament_json(participants_count: int, tournament_type: str = 'single elimination', completed_ratio: float = .5) -> dict:
+    """ JSON of a started tournament, with participants and matches included """
+    key = (participants_count, tournament_type, completed_ratio)
+    if key not in _cache:
+        server = FakeServer(seed=participants_count)
+        t_id = populate(server, participants_count, tournament_type, completed_ratio)
+        _cache[key] = server.dispatch('GET', ['tournaments', t_id], {'include_participants': True, 'include_matches': True})
+    return copy.deepcopy(_cache[key])
+
+
+def touched_matches_json(t_json: dict, ratio: float = .1) -> list:
+    """ matches of `t_json` as returned by a refresh where `ratio` of them have been updated """
+    matches = copy.deepcopy(t_json['tournament']['matches'])
+    step = max(1, int(1 / ratio)) if ratio else len(matches) + 1
+    for i, m in enumerate(matches):
+        if i % step == 0:
+            m['match']['updated_at'] = 'touched'
+            m['match']['scores_csv'] = '3-0'
+    return matches
@@ -0,0 +1,388 @@
+""" Benchmark runner
+
+Every benchmark is registered with :func:`benchmark` and returns a dict of measurements.
+Results are printed and, with ``-o``, written as JSON so they can be compared between runs.
+
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import aiohttp
+
+import challonge
+from challonge import ratings, simulation
+from challonge.fake import FakeServer
+from challonge.helpers import Connection
+from challonge.table import MatchTable
+from challonge.tournament import Tournament
+
+from . import fixtures
+
+
+SIZES = (16, 256, 2048)
+
+_benchmarks = []
+_options = {'repeat': 5, 'min_time': .2}
+
+
+def benchmark(name: str):
+    """ register a benchmark function """
+    def decorator(f):
+        _benchmarks.append((name, f))
+        return f
+    return decorator
+
+
+def measure(func, repeat: int = None, min_time: float = None) -> dict:
+    """ time `func` the way timeit does: calibrate a loop count, then keep the per-call timings of each repetition """
+    repeat = repeat or _options['repeat']
+    min_time = min_time or _options['min_time']
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10 or number >= 1 << 20:
+            break
+        number *= 2
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        'unit': 's/op',
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+# ----------------------------------------------------------------------
+# parsing
+
+def _bench_parse(size):
+    t_json = fixtures.tournament_json(size)
+    return measure(lambda: Tournament(None, t_json))
+
+
+def _bench_refresh(size):
+    t_json = fixtures.tournament_json(size)
+    t = Tournament(None, t_json)
+    matches = fixtures.touched_matches_json(t_json)
+    return measure(lambda: t._refresh_matches_from_json(matches))
+
+
+for _size in SIZES:
+    benchmark('parse_tournament_{}'.format(_size))(lambda size=_size: _bench_parse(size))
+    benchmark('refresh_matches_{}'.format(_size))(lambda size=_size: _bench_refresh(size))
+
+
+@benchmark('match_table_build_2048')
+def bench_match_table_build():
+    t = Tournament(None, fixtures.tournament_json(2048))
+    return measure(lambda: MatchTable(t.matches))
+
+
+@benchmark('match_table_scan_2048')
+def bench_match_table_scan():
+    # completed matches per round, from the columns vs from the objects
+    table = Tournament(None, fixtures.tournament_json(2048)).match_table
+    complete = table.states.index('complete')
+
+    def scan():
+        counts = {}
+        for r, s in zip(table.column('round'), table.column('state')):
+            if s == complete:
+                counts[r] = counts.get(r, 0) + 1
+        return counts
+    return measure(scan)
+
+
+@benchmark('match_objects_scan_2048')
+def bench_match_objects_scan():
+    matches = Tournament(None, fixtures.tournament_json(2048)).matches
+
+    def scan():
+        counts = {}
+        for m in matches:
+            if m.state == 'complete':
+                counts[m.round] = counts.get(m.round, 0) + 1
+        return counts
+    return measure(scan)
+
+
+# ----------------------------------------------------------------------
+# ratings
+
+def _bench_ratings(method, vectorize):
+    if vectorize and ratings.numpy is None:
+        return {'unit': 'skipped', 'reason': 'numpy is not installed'}
+    rng = random.Random(0)
+    # 100 tournaments of 1000 games between 5000 players
+    batches = [[('p{}'.format(rng.randrange(5000)), 'p{}'.format(rng.randrange(5000)), rng.random() < .5)
+                for _ in range(1000)] for _ in range(100)]
+
+    def process():
+        engine = ratings.RatingEngine(method=method, vectorize=vectorize)
+        for batch in batches:
+            engine.update(batch)
+    return measure(process, repeat=min(_options['repeat'], 3))
+
+
+for _method in ('elo', 'glicko'):
+    benchmark('ratings_backlog_100k_{}'.format(_method))(lambda method=_method: _bench_ratings(method, False))
+    benchmark('ratings_backlog_100k_{}_numpy'.format(_method))(lambda method=_method: _bench_ratings(method, True))
+
+
+# ----------------------------------------------------------------------
+# simulation
+
+@benchmark('simulate_bracket_256')
+def bench_simulate():
+    # one simulated bracket of 256 entrants
+    compiled = simulation.compile_bracket(Tournament(None, fixtures.tournament_json(256)))
+    rng = random.Random(0)
+    counts = [{} for _ in compiled.participant_ids]
+    points = [0] * len(compiled.participant_ids)
+    return measure(lambda: simulation._simulate_once(compiled, rng, counts, points))
+
+
+@benchmark('compile_bracket_2048')
+def bench_compile_bracket():
+    t = Tournament(None, fixtures.tournament_json(2048))
+    return measure(lambda: simulation.compile_bracket(t))
+
+
+# ----------------------------------------------------------------------
+# parameters encoding
+
+@benchmark('prepare_params_update')
+def bench_prepare_params_update():
+    params = {'name': 'my tournament', 'private': True, 'signup_cap': 64, 'open_signup': False,
+              'description': 'some description', 'pts_for_match_win': 1.0, 'hide_forum': True}
+    return measure(lambda: Connection._prepare_params(params, 'tournament'))
+
+
+@benchmark('prepare_params_bulk_add_2048')
+def bench_prepare_params_bulk():
+    params = {'name': ['player {}'.format(i) for i in range(2048)]}
+    return measure(lambda: Connection._prepare_params(params, 'participants[]'))
+
+
+@benchmark('prepare_params_bulk_add_2048_fields')
+def bench_prepare_params_bulk_fields():
+    params = {'name': ['player {}'.format(i) for i in range(2048)],
+              'misc': ['id:{}'.format(i) for i in range(2048)],
+              'seed': list(range(1, 2049))}
+    return measure(lambda: Connection._prepare_params(params, 'participants[]'))
+
+
+@benchmark('prepare_params_values')
+def bench_prepare_params_values():
+    params = {'start_at': datetime.datetime(2020, 1, 1, 12, 30), 'check_in_duration': 30,
+              'asset': b'\x00' * 1024, 'description': 'some description', 'private': False}
+    return measure(lambda: Connection._prepare_params(params, 'match_attachment'))
+
+
+# ----------------------------------------------------------------------
+# requests
+
+async def _throughput(requests_count, concurrency, keep_alive=False):
+    async with FakeServer() as server:
+        fixtures.populate(server, 16, url='bench')
+        connection = challonge.helpers.get_connection(server.username, server.api_key, keep_alive=keep_alive)
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                await connection('GET', 'tournaments/bench', include_participants=1, include_matches=1)
+                latencies.append(time.perf_counter() - start)
+
+        await one()  # warm up
+        latencies.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(requests_count)])
+        elapsed = time.perf_counter() - start
+        await connection.close()
+
+    latencies.sort()
+    return {
+        'unit': 'req/s',
+        'throughput': requests_count / elapsed,
+        'requests': requests_count,
+        'concurrency': concurrency,
+        'keep_alive': keep_alive,
+        'latency_p50': latencies[len(latencies) // 2],
+        'latency_p99': latencies[int(len(latencies) * .99)],
+    }
+
+
+def _run_async(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@benchmark('request_throughput_sequential')
+def bench_throughput_sequential():
+    return _run_async(_throughput(200, 1))
+
+
+@benchmark('request_throughput_concurrent')
+def bench_throughput_concurrent():
+    return _run_async(_throughput(500, 20))
+
+
+@benchmark('request_throughput_concurrent_keep_alive')
+def bench_throughput_concurrent_keep_alive():
+    return _run_async(_throughput(500, 20, keep_alive=True))
+
+
+# ----------------------------------------------------------------------
+# import time
+
+_IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+{}
+elapsed = time.perf_counter() - start
+print(elapsed, 'aiohttp' in sys.modules)
+"""
+
+
+def _import_time(statement, runs=None):
+    timings = []
+    for _ in range(runs or _options['repeat'] * 2):
+        out = subprocess.check_output([sys.executable, '-c', _IMPORT_SCRIPT.format(statement)], universal_newlines=True)
+        elapsed, aiohttp_loaded = out.split()
+        timings.append(float(elapsed))
+    return {
+        'unit': 's/op',
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'number': 1,
+        'repeat': len(timings),
+        'aiohttp_loaded': aiohttp_loaded == 'True',
+    }
+
+
+@benchmark('import_challonge')
+def bench_import():
+    return _import_time('import challonge')
+
+
+@benchmark('import_challonge_enums')
+def bench_import_enums():
+    return _import_time('from challonge import TournamentState, MatchState')
+
+
+@benchmark('import_challonge_models')
+def bench_import_models():
+    return _import_time('from challonge import User, Tournament, Match, Participant, Attachment')
+
+
+@benchmark('import_challonge_first_connection')
+def bench_import_connection():
+    # what the first request pays on top of the package import
+    return _import_time('import challonge, challonge.user, aiohttp')
+
+
+# ----------------------------------------------------------------------
+# memory
+
+@benchmark('peak_memory_tournament_2048')
+def bench_peak_memory():
+    t_json = fixtures.tournament_json(2048)
+    tracemalloc.start()
+    try:
+        t = Tournament(None, t_json)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'unit': 'bytes',
+        'peak': peak,
+        'retained': current,
+        'participants': len(t.participants),
+        'matches': len(t.matches),
+    }
+
+
+# ----------------------------------------------------------------------
+
+def run(selected=None) -> dict:
+    results = {}
+    for name, f in _benchmarks:
+        if selected and not any(s in name for s in selected):
+            continue
+        results[name] = f()
+        print('{:<40} {}'.format(name, _summary(results[name])), flush=True)
+    return {
+        'meta': {
+            'achallonge': challonge.__version__,
+            'aiohttp': aiohttp.__version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+        },
+        'results': results,
+    }
+
+
+def _summary(result):
+    unit = result['unit']
+    if unit == 's/op':
+        return '{:>12.3f} us/op (median)'.format(result['median'] * 1e6)
+    if unit == 'req/s':
+        return '{:>12.1f} req/s'.format(result['throughput'])
+    if unit == 'bytes':
+        return '{:>12.1f} KiB peak'.format(result['peak'] / 1024)
+    return json.dumps(result)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='achallonge offline benchmarks')
+    parser.add_argument('-o', '--output', help='write the results as JSON to this file')
+    parser.add_argument('-k', '--select', action='append', help='only run benchmarks whose name contains this string')
+    parser.add_argument('--quick', action='store_true', help='fewer and shorter repetitions')
+    parser.add_argument('--list', action='store_true', help='list the available benchmarks')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, _ in _benchmarks:
+            print(name)
+        return
+    if args.quick:
+        _options.update(repeat=2, min_time=.02)
+
+    report = run(args.select)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 # flake8: noqa
+import sys
 
 __version__ = "1.9.0"
 __author__ = "fp12"
@@ -9,10 +10,50 @@ USE_FIELDS_DESCRIPTORS = True
 USE_EXCEPTIONS = True
 
 
-from .helpers import APIException
-from .user import User, get_user
-from .tournament import Tournament
-from .participant import Participant
-from .match import Match
-from .attachment import Attachment
-from .enums import TournamentState, TournamentType, TournamentStateResult, DoubleEliminationEnding, RankingOrder, Pairing, MatchState
+# public names and the submodule defining them, imported on first access (PEP 562)
+_lazy_names = {
+    'APIException': 'helpers', 'CircuitOpenError': 'helpers', 'CircuitBreaker': 'helpers', 'BulkResult': 'helpers', 'BulkAddError': 'helpers',
+    'User': 'user', 'get_user': 'user',
+    'Tournament': 'tournament',
+    'Participant': 'participant',
+    'Match': 'match',
+    'Attachment': 'attachment',
+    'VoteAccumulator': 'votes',
+    'MatchTable': 'table',
+    'TournamentIndex': 'index', 'ParticipantNameIndex': 'index', 'MatchIndex': 'index',
+    'BracketRenderer': 'bracket',
+    'RatingEngine': 'ratings',
+    'simulate': 'simulation',
+    'export_tournaments': 'export', 'JsonLinesWriter': 'export', 'ParquetWriter': 'export',
+    'WebhookReceiver': 'webhooks',
+    'ShardedPoller': 'poller',
+    'CacheStore': 'cache', 'MemoryCacheStore': 'cache', 'SQLiteCacheStore': 'cache',
+    'Metrics': 'metrics',
+    'SyncClient': 'sync',
+    'TournamentState': 'enums', 'TournamentType': 'enums', 'TournamentStateResult': 'enums',
+    'DoubleEliminationEnding': 'enums', 'RankingOrder': 'enums', 'Pairing': 'enums', 'MatchState': 'enums',
+}
+_submodules = {'helpers', 'user', 'tournament', 'participant', 'match', 'attachment', 'metrics', 'enums', 'fake', 'sync', 'votes', 'table', 'export', 'ratings', 'simulation', 'webhooks', 'poller', 'cache', 'index', 'bracket'}
+
+__all__ = list(_lazy_names)
+
+
+def __getattr__(name):
+    import importlib
+    if name in _lazy_names:
+        value = getattr(importlib.import_module('.' + _lazy_names[name], __name__), name)
+        globals()[name] = value
+        return value
+    if name in _submodules:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_names))
+
+
+if sys.version_info < (3, 7):
+    # no module __getattr__ before python 3.7
+    for _name in _lazy_names:
+        __getattr__(_name)
@@ -16,6 +16,9 @@ class Attachment(metaclass=FieldHolder):
     def _refresh_from_json(self, json_def):
         if 'match_attachment' in json_def:
             self._get_from_dict(json_def['match_attachment'])
+        elif 'attachment' in json_def:
+            # attachments listed in a match
+            self._get_from_dict(json_def['attachment'])
 
     @staticmethod
     def prepare_params(asset, url: str, description: str):
@@ -0,0 +1,242 @@
+from xml.sax.saxutils import escape, quoteattr
+
+
+class BracketRenderer:
+    """ Renders the matches of a tournament as plain text or SVG, re-rendering only what changed
+
+    Each match is rendered once into a fragment kept until the match changes, which is detected with its
+    `updated_at` and the names of its players. A changed match invalidates its fragment and the fragments of
+    the matches depending on it through `player1_prereq_match_id` / `player2_prereq_match_id`, the other
+    fragments are reused. The whole output is kept as well, and returned as is while nothing changed.
+
+    The bracket has a column per round, the losers bracket (negative rounds) and each group being drawn below.
+    The third place match of a single elimination bracket (round 0) comes after the last round.
+    Matches waiting for a player show where it comes from, e.g. ``Loser of C``.
+
+    Usually obtained with :attr:`Tournament.bracket_renderer`, which renders :attr:`Tournament.matches`.
+
+    Example::
+
+        svg = tournament.bracket_renderer.render_svg()
+        await match.report_winner(p, '2-0')
+        svg = tournament.bracket_renderer.render_svg()  # only the match and the ones after it are rendered again
+
+    Args:
+        tournament: the tournament whose matches are rendered
+        match_width: width of a match in the SVG, in pixels
+        match_height: height of a match in the SVG, in pixels
+        spacing: space between two matches or two rounds in the SVG, in pixels
+
+    Attributes:
+        rendered: number of match fragments rendered so far
+
+    """
+    formats = ('text', 'svg')
+
+    def __init__(self, tournament, match_width: int = 180, match_height: int = 40, spacing: int = 20):
+        self.tournament = tournament
+        self.match_width = match_width
+        self.match_height = match_height
+        self.spacing = spacing
+        self.rendered = 0
+
+        self._layout_key = None
+        self._matches = {}
+        self._sections = []
+        self._positions = {}
+        self._size = (0, 0)
+        self._dependents = {}
+        self._stamps = {}
+        self._fragments = {f: {} for f in self.formats}
+        self._outputs = {}
+
+    def render_text(self) -> str:
+        """ the bracket as plain text, a line per match below a title per round """
+        return self._render('text')
+
+    def render_svg(self) -> str:
+        """ the bracket as a standalone SVG document """
+        return self._render('svg')
+
+    def invalidate(self):
+        """ forget everything rendered so far """
+        self._layout_key = None
+        self._stamps = {}
+        for fragments in self._fragments.values():
+            fragments.clear()
+        self._outputs = {}
+
+    # ------------------------------------------------------------------
+    # change tracking
+
+    def _render(self, fmt):
+        self._sync()
+        output = self._outputs.get(fmt)
+        if output is None:
+            fragments = self._fragments[fmt]
+            for m in self._matches.values():
+                if m.id not in fragments:
+                    fragments[m.id] = self._render_text(m) if fmt == 'text' else self._render_svg(m)
+                    self.rendered += 1
+            output = self._outputs[fmt] = self._assemble_text() if fmt == 'text' else self._assemble_svg()
+        return output
+
+    def _sync(self):
+        matches = self.tournament.matches or ()
+        layout_key = tuple((m.id, m.round, m.group_id) for m in matches)
+        if layout_key != self._layout_key:
+            self.invalidate()
+            self._layout(matches)
+            self._layout_key = layout_key
+
+        dirty = set()
+        for m in matches:
+            stamp = (m.updated_at, self._name(m.player1_id), self._name(m.player2_id))
+            if self._stamps.get(m.id) != stamp:
+                self._stamps[m.id] = stamp
+                dirty.add(m.id)
+        if not dirty:
+            return
+
+        # the matches after a changed one show its result
+        todo = list(dirty)
+        while todo:
+            for m_id in self._dependents.get(todo.pop(), ()):
+                if m_id not in dirty:
+                    dirty.add(m_id)
+                    todo.append(m_id)
+        for fragments in self._fragments.values():
+            for m_id in dirty:
+                fragments.pop(m_id, None)
+        self._outputs = {}
+
+    def _layout(self, matches):
+        self._matches = {m.id: m for m in matches}
+        self._dependents = {}
+        for m in matches:
+            for prereq in (m.player1_prereq_match_id, m.player2_prereq_match_id):
+                if prereq is not None:
+                    self._dependents.setdefault(prereq, []).append(m.id)
+
+        index = self.tournament.match_index
+        groups = [None] + index.groups()
+        self._sections = []
+        for group_id in groups:
+            rounds = index.rounds(group_id=group_id)
+            for losers in (False, True):
+                if losers:
+                    ordered = sorted((r for r in rounds if r < 0), key=abs)
+                else:
+                    # round 0 is the third place match, played alongside the final
+                    ordered = sorted(r for r in rounds if r > 0) + [r for r in rounds if r == 0]
+                columns = []
+                for r in ordered:
+                    ms = index.matches(round=r, group_id=group_id)
+                    columns.append((r, [m.id for m in sorted(ms, key=lambda m: (m.suggested_play_order or 0, m.id))]))
+                if columns:
+                    self._sections.append((group_id, losers, columns))
+
+        self._positions = {}
+        step_x = self.match_width + self.spacing
+        step_y = self.match_height + self.spacing
+        top = self.spacing
+        width = 0
+        for _, _, columns in self._sections:
+            rows = max(len(ids) for _, ids in columns)
+            for x, (_, ids) in enumerate(columns):
+                # later rounds have fewer matches, centered between the ones before
+                offset = (rows - len(ids)) * step_y / 2
+                for y, m_id in enumerate(ids):
+                    self._positions[m_id] = (self.spacing + x * step_x, top + offset + y * step_y)
+            width = max(width, self.spacing + len(columns) * step_x)
+            top += rows * step_y + self.spacing
+        self._size = (width, top)
+
+    def _name(self, p_id):
+        if p_id is None:
+            return None
+        p = self.tournament._find_participant(p_id)
+        return p.name if p is not None else str(p_id)
+
+    def _label(self, m, slot):
+        name = self._stamps[m.id][slot]
+        if name is not None:
+            return name
+        prereq = self._matches.get(getattr(m, 'player{}_prereq_match_id'.format(slot)))
+        if prereq is None:
+            return 'TBD'
+        loser = getattr(m, 'player{}_is_prereq_match_loser'.format(slot))
+        return '{} of {}'.format('Loser' if loser else 'Winner', prereq.identifier)
+
+    def _title(self, group_id, losers, r):
+        if r == 0:
+            title = 'Third place match'
+        else:
+            title = '{} {}'.format('Losers round' if losers else 'Round', abs(r))
+        return title if group_id is None else 'Group {} {}'.format(group_id, title.lower())
+
+    # ------------------------------------------------------------------
+    # text
+
+    def _render_text(self, m) -> str:
+        p1, p2 = self._label(m, 1), self._label(m, 2)
+        if m.winner_id is not None:
+            if m.winner_id == m.player1_id:
+                p1 += ' *'
+            elif m.winner_id == m.player2_id:
+                p2 += ' *'
+        return '  {:>3}  {} vs {}  {}'.format(m.identifier or '', p1, p2, m.scores_csv or m.state or '').rstrip()
+
+    def _assemble_text(self) -> str:
+        fragments = self._fragments['text']
+        lines = []
+        for group_id, losers, columns in self._sections:
+            for r, ids in columns:
+                lines.append(self._title(group_id, losers, r))
+                lines.extend(fragments[m_id] for m_id in ids)
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    # ------------------------------------------------------------------
+    # svg
+
+    def _render_svg(self, m) -> str:
+        x, y = self._positions[m.id]
+        w, h = self.match_width, self.match_height
+        parts = ['<g class="match {}" id="match-{}">'.format(m.state or '', m.id),
+                 '<rect x="{}" y="{}" width="{}" height="{}" rx="3"/>'.format(x, y, w, h),
+                 '<line x1="{}" y1="{}" x2="{}" y2="{}"/>'.format(x, y + h / 2, x + w, y + h / 2)]
+        scores = (m.scores_csv or '').split(',')[-1].split('-')
+        for slot in (1, 2):
+            player_id = getattr(m, 'player{}_id'.format(slot))
+            css = 'player winner' if player_id is not None and player_id == m.winner_id else 'player'
+            text_y = y + h * (slot * 2 - 1) / 4
+            parts.append('<text class={} x="{}" y="{}" dominant-baseline="middle">{}</text>'.format(
+                quoteattr(css), x + 6, text_y, escape(self._label(m, slot))))
+            if len(scores) == 2:
+                parts.append('<text class="score" x="{}" y="{}" dominant-baseline="middle" text-anchor="end">{}</text>'.format(
+                    x + w - 6, text_y, escape(scores[slot - 1])))
+        # connectors from the matches this one waits for
+        for slot in (1, 2):
+            prereq = getattr(m, 'player{}_prereq_match_id'.format(slot))
+            if prereq in self._positions and not getattr(m, 'player{}_is_prereq_match_loser'.format(slot)):
+                px, py = self._positions[prereq]
+                parts.append('<path class="link" d="M{} {} H{} V{} H{}" fill="none"/>'.format(
+                    px + w, py + h / 2, x - self.spacing / 2, y + h * (slot * 2 - 1) / 4, x))
+        parts.append('</g>')
+        return ''.join(parts)
+
+    def _assemble_svg(self) -> str:
+        fragments = self._fragments['svg']
+        width, height = self._size
+        parts = ['<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}" viewBox="0 0 {0} {1}" '
+                 'font-family="sans-serif" font-size="12" fill="none" stroke="black">'.format(width, height),
+                 '<style>text {fill: black; stroke: none} .winner {font-weight: bold}</style>']
+        for group_id, losers, columns in self._sections:
+            for r, ids in columns:
+                if ids:
+                    x, y = self._positions[ids[0]]
+                    parts.append('<text class="round" x="{}" y="{}">{}</text>'.format(
+                        x, y - self.spacing / 4, escape(self._title(group_id, losers, r))))
+                parts.extend(fragments[m_id] for m_id in ids)
+        parts.append('</svg>')
+        return '\n'.join(parts) + '\n'
@@ -0,0 +1,231 @@
+import abc
+import collections
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class CacheStore(abc.ABC):
+    """ Interface of the stores caching the answers of the API for :class:`Connection`
+
+    Values are JSON documents: a store keeps them serialized and returns a new copy on every hit.
+    A value can be tagged, e.g. with the tournament it is about, to be forgotten with :func:`delete_tag`
+    whatever its key.
+
+    Args:
+        default_ttl: seconds an answer stays valid when :func:`set` is given no `ttl`
+
+    Attributes:
+        hits: number of :func:`get` that found a valid value
+        misses: number of :func:`get` that did not
+
+    """
+
+    def __init__(self, default_ttl: float = 60.0):
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+
+    @abc.abstractmethod
+    def get(self, key: str):
+        """ the value stored for `key`, None if there is none or if it expired """
+
+    @abc.abstractmethod
+    def set(self, key: str, value, ttl: float = None, tags=()):
+        """ store `value` for `ttl` seconds (:attr:`default_ttl` by default), tagged with each of `tags` """
+
+    @abc.abstractmethod
+    def delete_prefix(self, prefix: str):
+        """ forget the values of all the keys starting with `prefix` """
+
+    @abc.abstractmethod
+    def delete_tag(self, tag: str):
+        """ forget the values tagged with `tag` """
+
+    @abc.abstractmethod
+    def clear(self):
+        """ forget everything """
+
+    def close(self):
+        pass
+
+    def _count(self, value):
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+
+class MemoryCacheStore(CacheStore):
+    """ Cache in the memory of this process, the least recently used values are evicted first
+
+    Args:
+        default_ttl: seconds an answer stays valid by default
+        max_entries: number of values kept at most
+
+    """
+
+    def __init__(self, default_ttl: float = 60.0, max_entries: int = 10000):
+        super().__init__(default_ttl)
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._tagged = {}
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return self._count(None)
+        expires, data, _ = entry
+        if expires <= time.monotonic():
+            self._drop(key)
+            return self._count(None)
+        self._entries.move_to_end(key)
+        return self._count(json.loads(data))
+
+    def set(self, key: str, value, ttl: float = None, tags=()):
+        expires = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (expires, json.dumps(value), tuple(tags))
+        for tag in tags:
+            self._tagged.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tagged[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tagged[tag]
+
+    def delete_prefix(self, prefix: str):
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            self._drop(key)
+
+    def delete_tag(self, tag: str):
+        for key in list(self._tagged.get(tag, ())):
+            self._drop(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._tagged.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheStore(CacheStore):
+    """ Cache in a SQLite database in WAL mode, that the processes of a host can share
+
+    Expired values are removed, then the oldest ones, when the values take more than `max_size` bytes.
+    Eviction runs every `evict_every` writes of this process.
+    Every process (and thread) opens its own connection to the database.
+
+    Args:
+        path: file of the database, created if needed
+        default_ttl: seconds an answer stays valid by default
+        max_size: bytes of serialized values kept at most
+        evict_every: number of writes between two evictions
+        timeout: seconds to wait for a lock held by another process
+
+    """
+
+    def __init__(self, path: str, default_ttl: float = 60.0, max_size: int = 64 * 1024 * 1024,
+                 evict_every: int = 100, timeout: float = 5.0):
+        super().__init__(default_ttl)
+        self.path = path
+        self.max_size = max_size
+        self.evict_every = evict_every
+        self.timeout = timeout
+        self._local = threading.local()
+        self._writes = 0
+        with self._db() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS cache ('
+                       'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, '
+                       'stored REAL NOT NULL, size INTEGER NOT NULL)')
+            db.execute('CREATE INDEX IF NOT EXISTS cache_stored ON cache (stored)')
+            db.execute('CREATE TABLE IF NOT EXISTS tags (tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))')
+
+    def _db(self) -> sqlite3.Connection:
+        # sqlite connections must not cross threads nor forks
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def get(self, key: str):
+        row = self._db().execute('SELECT value FROM cache WHERE key = ? AND expires > ?', (key, time.time())).fetchone()
+        return self._count(None if row is None else json.loads(row[0]))
+
+    def set(self, key: str, value, ttl: float = None, tags=()):
+        now = time.time()
+        data = json.dumps(value)
+        expires = now + (self.default_ttl if ttl is None else ttl)
+        db = self._db()
+        db.execute('INSERT OR REPLACE INTO cache (key, value, expires, stored, size) VALUES (?, ?, ?, ?, ?)',
+                   (key, data, expires, now, len(data)))
+        if tags:
+            db.executemany('INSERT OR IGNORE INTO tags (tag, key) VALUES (?, ?)', [(tag, key) for tag in tags])
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.evict()
+
+    def delete_prefix(self, prefix: str):
+        # a range on the primary key instead of LIKE, which would scan the table
+        self._db().execute('DELETE FROM cache WHERE key >= ? AND key < ?', (prefix, prefix + '\U0010ffff'))
+
+    def delete_tag(self, tag: str):
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute('DELETE FROM cache WHERE key IN (SELECT key FROM tags WHERE tag = ?)', (tag,))
+            db.execute('DELETE FROM tags WHERE tag = ?', (tag,))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def clear(self):
+        db = self._db()
+        db.execute('DELETE FROM cache')
+        db.execute('DELETE FROM tags')
+
+    def evict(self):
+        """ remove the expired values, then the oldest ones until the values take at most `max_size` bytes """
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+            total = db.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+            if total > self.max_size:
+                excess = total - self.max_size
+                oldest = []
+                for key, size in db.execute('SELECT key, size FROM cache ORDER BY stored'):
+                    oldest.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                db.executemany('DELETE FROM cache WHERE key = ?', oldest)
+            db.execute('DELETE FROM tags WHERE key NOT IN (SELECT key FROM cache)')
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    def __len__(self):
+        return self._db().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+
+
+class JsonLinesWriter:
+    """ Writes every record as one JSON object per line, its kind in the ``record_type`` key
+
+    Args:
+        file: path of the file to create, or a text file object that will not be closed
+
+    """
+
+    def __init__(self, file):
+        if isinstance(file, str):
+            self._file = open(file, 'w', encoding='utf-8')
+            self._owned = True
+        else:
+            self._file = file
+            self._owned = False
+
+    def write(self, kind: str, record: dict):
+        line = dict(record)
+        line['record_type'] = kind
+        self._file.write(json.dumps(line, ensure_ascii=False, default=str))
+        self._file.write('\n')
+
+    def close(self):
+        if self._owned:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ParquetWriter:
+    """ Writes one Parquet file per kind of record in `directory`: ``tournament.parquet``, ``participant.parquet``...
+
+    Records are buffered and written by row groups of `batch_size` rows.
+    The schema of a file is the one of its first row group, columns that only had missing
+    values by then are strings. Lists and dicts, e.g. `group_player_ids`, are stored as JSON strings.
+
+    Requires `pyarrow <https://arrow.apache.org/docs/python/>`_ (``pip install achallonge[parquet]``).
+
+    Args:
+        directory: where the files are created
+        batch_size: rows per row group
+
+    Raises:
+        ImportError: pyarrow is not installed
+
+    """
+
+    def __init__(self, directory: str, batch_size: int = 1024):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('ParquetWriter needs pyarrow, install it with `pip install achallonge[parquet]`')
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.directory = directory
+        self.batch_size = batch_size
+        self._buffers = {}
+        self._writers = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, kind: str, record: dict):
+        buffer = self._buffers.setdefault(kind, [])
+        buffer.append(dict(record))
+        if len(buffer) >= self.batch_size:
+            self._flush(kind)
+
+    def _flush(self, kind: str):
+        rows = self._buffers.pop(kind, None)
+        if not rows:
+            return
+        pa = self._pa
+        for row in rows:
+            for name, value in row.items():
+                # an empty list in a whole row group would make a column of nulls
+                if isinstance(value, (list, dict)):
+                    row[name] = json.dumps(value, default=str)
+        writer = self._writers.get(kind)
+        if writer is None:
+            table = pa.Table.from_pylist(rows)
+            schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in table.schema])
+            writer = self._writers[kind] = self._pq.ParquetWriter(os.path.join(self.directory, kind + '.parquet'), schema)
+        schema = writer.schema
+        string_columns = [f.name for f in schema if pa.types.is_string(f.type)]
+        for row in rows:
+            for name in string_columns:
+                value = row.get(name)
+                if value is not None and not isinstance(value, str):
+                    row[name] = str(value)
+        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+
+    def close(self):
+        for kind in list(self._buffers):
+            self._flush(kind)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+async def _fetch_tournament(connection, t_id, attachments: bool) -> dict:
+    res = await connection('GET', 'tournaments/{}'.format(t_id), use_cache=False, store_in_cache=False,
+                           include_participants=1, include_matches=1)
+    t_data = res['tournament']
+    if attachments and any(m['match'].get('attachment_count') for m in t_data.get('matches', [])):
+        t_data['matches'] = await connection('GET', 'tournaments/{}/matches'.format(t_id), use_cache=False,
+                                             store_in_cache=False, include_attachments=1)
+    return t_data
+
+
+def _write_tournament(writers, t_data: dict, counts: dict):
+    def write(kind, record):
+        for w in writers:
+            w.write(kind, record)
+        counts[kind] += 1
+
+    participants = t_data.pop('participants', None) or []
+    matches = t_data.pop('matches', None) or []
+    write('tournament', t_data)
+    for p in participants:
+        write('participant', p['participant'])
+    for m in matches:
+        m_data = m['match']
+        for a in m_data.pop('attachments', None) or []:
+            a_data = dict(a.get('attachment') or a.get('match_attachment'))
+            a_data['tournament_id'] = t_data['id']
+            write('attachment', a_data)
+        write('match', m_data)
+
+
+async def export_tournaments(user, writer, state: str = None, subdomain: str = None, concurrency: int = 4, attachments: bool = True) -> dict:
+    """ stream the tournaments of an account, with their participants, matches and attachments, to `writer`
+
+    |funccoro|
+
+    Only the list of tournament ids is kept for the whole account: at most `concurrency` tournaments are
+    downloaded at the same time and each one is written as soon as it is complete, then dropped.
+    The requests bypass the :attr:`Connection.cache` of `user`: nothing is read from it nor added to it.
+
+    Example::
+
+        with JsonLinesWriter('archive.jsonl') as jsonl, ParquetWriter('archive') as parquet:
+            counts = await export_tournaments(user, [jsonl, parquet], state='ended')
+
+    Args:
+        user: the account to export
+        writer: a :class:`JsonLinesWriter`, a :class:`ParquetWriter`, any object with a `write(kind, record)` method, or a list of them
+        state: *optional* only export tournaments in this state: ``pending``, ``in_progress`` or ``ended``
+        subdomain: *optional* export the tournaments of this organization
+        concurrency: maximum number of tournaments downloaded at the same time
+        attachments: also export the match attachments, one more request per tournament that has some
+
+    Returns:
+        dict: number of records written per kind
+
+    Raises:
+        APIException
+
+    """
+    writers = writer if isinstance(writer, (list, tuple)) else [writer]
+    params = {'include_participants': 0, 'include_matches': 0}
+    if state is not None:
+        params['state'] = state
+    if subdomain is not None:
+        params['subdomain'] = subdomain
+    res = await user.connection('GET', 'tournaments', use_cache=False, store_in_cache=False, **params)
+    ids = iter([t['tournament']['id'] for t in res])
+    del res
+
+    counts = {'tournament': 0, 'participant': 0, 'match': 0, 'attachment': 0}
+
+    async def worker():
+        # workers share the iterator of ids
+        for t_id in ids:
+            t_data = await _fetch_tournament(user.connection, t_id, attachments)
+            _write_tournament(writers, t_data, counts)
+
+    tasks = [asyncio.ensure_future(worker()) for _ in range(max(1, concurrency))]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return counts
@@ -0,0 +1,907 @@
+""" Local stand-in for the Challonge API
+
+:class:`FakeServer` keeps every tournament, participant, match and attachment in memory
+and answers the requests made by :class:`User`, :class:`Tournament`, :class:`Participant`,
+:class:`Match` and :class:`Attachment`, so the library can be tested and benchmarked without
+network access nor Challonge credentials::
+
+    async with FakeServer() as server:
+        user = await challonge.get_user(server.username, server.api_key)
+
+"""
+import asyncio
+import hashlib
+import math
+import random
+import re
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+
+import aiohttp
+from aiohttp import web
+
+from .helpers import Connection
+
+
+_BOOL_FIELDS = {'accept_attachments', 'hide_forum', 'show_rounds', 'open_signup', 'private',
+                'notify_users_when_matches_open', 'notify_users_when_the_tournament_ends',
+                'sequential_pairings', 'hold_third_place_match', 'quick_advance',
+                'include_participants', 'include_matches', 'include_attachments'}
+_INT_FIELDS = {'signup_cap', 'swiss_rounds', 'check_in_duration', 'seed',
+               'player1_votes', 'player2_votes', 'participant_id'}
+
+# `state` filter of the tournaments list
+_LIST_STATES = {'all': None,
+                'pending': {'pending', 'checking_in', 'checked_in'},
+                'in_progress': {'underway', 'awaiting_review'},
+                'ended': {'complete'}}
+
+_KEY_RE = re.compile(r'^([^\[]+)((?:\[[^\]]*\])*)$')
+_SUB_RE = re.compile(r'\[([^\]]*)\]')
+
+
+def _convert(field, value):
+    if field in _BOOL_FIELDS:
+        return value in ('true', '1', True)
+    if field in _INT_FIELDS:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    return value
+
+
+def parse_params(items) -> dict:
+    """ rebuild nested parameters the way Rails does
+
+    ``tournament[name]=x`` becomes ``{'tournament': {'name': 'x'}}`` and
+    ``participants[][name]=a&participants[][name]=b`` becomes ``{'participants': [{'name': 'a'}, {'name': 'b'}]}``:
+    a new item starts whenever a field already present in the last item shows up again.
+
+    """
+    result = {}
+    for key, value in items:
+        m = _KEY_RE.match(key)
+        if m is None:
+            continue
+        base, subs = m.group(1), _SUB_RE.findall(m.group(2))
+        if not subs:
+            result[base] = _convert(base, value)
+        elif len(subs) == 1 and subs[0]:
+            result.setdefault(base, {})[subs[0]] = _convert(subs[0], value)
+        elif len(subs) == 1:
+            result.setdefault(base, []).append(value)
+        elif subs[0] == '' and subs[1]:
+            items_list = result.setdefault(base, [])
+            if not items_list or subs[1] in items_list[-1]:
+                items_list.append({})
+            items_list[-1][subs[1]] = _convert(subs[1], value)
+    return result
+
+
+class _Error(Exception):
+    def __init__(self, status, *errors):
+        super().__init__(status, errors)
+        self.status = status
+        self.errors = list(errors)
+
+
+class FakeServer:
+    """ In-memory Challonge API served by aiohttp on localhost
+
+    Args:
+        username: login expected in the basic authentication
+        api_key: password expected in the basic authentication
+        host: interface to bind
+        port: port to bind, 0 picks a free one
+        latency: seconds added to every response, either a number or a ``(min, max)`` tuple
+        error_rate: probability for any request to fail with a 500
+        seed: seed for the random generator used by error injection and participant shuffling
+
+    The server can run in the current event loop (``await server.start()`` or ``async with``) or in
+    a background thread with its own loop (:func:`start_in_thread` or ``with``).
+    Both context managers also :func:`install` the server, pointing :attr:`Connection.challonge_api_url` at it.
+
+    """
+
+    def __init__(self, username: str = 'fake_user', api_key: str = 'fake_api_key', host: str = '127.0.0.1', port: int = 0,
+                 latency=0.0, error_rate: float = 0.0, seed: int = None):
+        self.username = username
+        self.api_key = api_key
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.request_count = 0
+
+        self._forced_errors = []
+        self._runner = None
+        self._thread = None
+        self._thread_loop = None
+        self._previous_url = None
+        self._last_clock = 0.0
+        self._next_id = 1
+        self.reset()
+
+    # ------------------------------------------------------------------
+    # lifecycle
+
+    @property
+    def api_url(self) -> str:
+        """ url template to use as :attr:`Connection.challonge_api_url` """
+        return 'http://{}:{}/v1/{{}}.json'.format(self.host, self.port)
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route('*', '/v1/{path:.+}.json', self._handle)
+        return app
+
+    async def start(self):
+        """ start serving in the running event loop
+
+        |methcoro|
+
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        await web.SockSite(self._runner, sock).start()
+        return self
+
+    async def stop(self):
+        """ stop serving
+
+        |methcoro|
+
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def start_in_thread(self):
+        """ start serving from a dedicated event loop running in a daemon thread """
+        started = threading.Event()
+
+        def run():
+            self._thread_loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._thread_loop)
+            self._thread_loop.run_until_complete(self.start())
+            started.set()
+            self._thread_loop.run_forever()
+            self._thread_loop.run_until_complete(self.stop())
+            self._thread_loop.close()
+
+        self._thread = threading.Thread(target=run, name='challonge-fake-server', daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop_thread(self):
+        """ stop a server started with :func:`start_in_thread` """
+        if self._thread is not None:
+            self._thread_loop.call_soon_threadsafe(self._thread_loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def install(self):
+        """ point :attr:`Connection.challonge_api_url` to this server """
+        self._previous_url = Connection.challonge_api_url
+        Connection.challonge_api_url = self.api_url
+
+    def uninstall(self):
+        """ restore the :attr:`Connection.challonge_api_url` that was set before :func:`install` """
+        if self._previous_url is not None:
+            Connection.challonge_api_url = self._previous_url
+            self._previous_url = None
+
+    async def __aenter__(self):
+        await self.start()
+        self.install()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.uninstall()
+        await self.stop()
+
+    def __enter__(self):
+        self.start_in_thread()
+        self.install()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.uninstall()
+        self.stop_thread()
+
+    # ------------------------------------------------------------------
+    # state
+
+    def reset(self):
+        """ forget every stored object """
+        self.tournaments = {}
+        self.participants = {}
+        self.matches = {}
+        self.attachments = {}
+
+    def fail_next(self, count: int = 1, status: int = 500):
+        """ make the next `count` requests fail with the given HTTP `status` """
+        self._forced_errors.extend([status] * count)
+
+    def _new_id(self):
+        new_id = self._next_id
+        self._next_id += 1
+        return new_id
+
+    def _now(self):
+        # strictly increasing so that `updated_at` always changes on a modification
+        clock = max(time.time(), self._last_clock + 1e-6)
+        self._last_clock = clock
+        return datetime.fromtimestamp(clock, timezone.utc).isoformat()
+
+    # ------------------------------------------------------------------
+    # http
+
+    async def _handle(self, request):
+        self.request_count += 1
+        if self.latency:
+            delay = self.random.uniform(*self.latency) if isinstance(self.latency, tuple) else self.latency
+            await asyncio.sleep(delay)
+
+        if self._forced_errors:
+            return self._error_response(self._forced_errors.pop(0), 'Injected error')
+        if self.error_rate and self.random.random() < self.error_rate:
+            return self._error_response(500, 'Injected error')
+
+        auth = request.headers.get(aiohttp.hdrs.AUTHORIZATION)
+        try:
+            credentials = aiohttp.BasicAuth.decode(auth) if auth else None
+        except ValueError:
+            credentials = None
+        if credentials is None or credentials.login != self.username or credentials.password != self.api_key:
+            return self._error_response(401, 'Unauthorized')
+
+        items = list(request.query.items())
+        if request.can_read_body:
+            post = await request.post()
+            items.extend((k, v.file.read() if isinstance(v, web.FileField) else v) for k, v in post.items())
+        params = parse_params(items)
+
+        try:
+            data = self.dispatch(request.method, request.match_info['path'].strip('/').split('/'), params)
+        except _Error as e:
+            return self._error_response(e.status, *e.errors)
+        return web.json_response(data)
+
+    @staticmethod
+    def _error_response(status, *errors):
+        return web.json_response({'errors': list(errors)}, status=status)
+
+    def dispatch(self, method: str, path: list, params: dict):
+        """ route an API call to the in-memory store and return the JSON-ready response """
+        if path[0] != 'tournaments':
+            raise _Error(404, 'Not found')
+        if len(path) == 1:
+            if method == 'GET':
+                return self._list_tournaments(params)
+            if method == 'POST':
+                return self._create_tournament(params)
+            raise _Error(404, 'Not found')
+
+        t = self._get_tournament(path[1])
+        rest = path[2:]
+        if not rest:
+            if method == 'GET':
+                return self._tournament_json(t, params)
+            if method == 'PUT':
+                return self._update_tournament(t, params)
+            if method == 'DELETE':
+                return self._destroy_tournament(t)
+        elif len(rest) == 1 and method == 'POST' and rest[0] in self._tournament_actions:
+            self._tournament_actions[rest[0]](self, t)
+            t['updated_at'] = self._now()
+            return self._tournament_json(t, params)
+        elif rest[0] == 'participants':
+            return self._dispatch_participants(method, t, rest[1:], params)
+        elif rest[0] == 'matches':
+            return self._dispatch_matches(method, t, rest[1:], params)
+        raise _Error(404, 'Not found')
+
+    # ------------------------------------------------------------------
+    # tournaments
+
+    _tournament_defaults = {
+        'accept_attachments': False, 'allow_participant_match_reporting': True, 'anonymous_voting': False,
+        'category': None, 'check_in_duration': None, 'completed_at': None, 'created_by_api': True,
+        'credit_capped': False, 'description': '', 'game_id': None, 'group_stages_enabled': False,
+        'hide_forum': False, 'hide_seeds': False, 'hold_third_place_match': False, 'max_predictions_per_user': 1,
+        'notify_users_when_matches_open': False, 'notify_users_when_the_tournament_ends': False,
+        'open_signup': False, 'participants_count': 0, 'prediction_method': 0, 'predictions_opened_at': None,
+        'private': False, 'progress_meter': 0, 'pts_for_bye': '1.0', 'pts_for_game_tie': '0.0',
+        'pts_for_game_win': '0.0', 'pts_for_match_tie': '0.5', 'pts_for_match_win': '1.0', 'quick_advance': False,
+        'ranked_by': 'match wins', 'require_score_agreement': False, 'rr_pts_for_game_tie': '0.0',
+        'rr_pts_for_game_win': '0.0', 'rr_pts_for_match_tie': '0.5', 'rr_pts_for_match_win': '1.0',
+        'sequential_pairings': False, 'show_rounds': False, 'signup_cap': None, 'start_at': None, 'started_at': None,
+        'started_checking_in_at': None, 'state': 'pending', 'swiss_rounds': 0, 'teams': False,
+        'tie_breaks': ['match wins vs tied', 'game wins', 'points scored'], 'tournament_type': 'single elimination',
+        'description_source': '', 'subdomain': None, 'live_image_url': None, 'sign_up_url': None,
+        'review_before_finalizing': True, 'accepting_predictions': False, 'participants_locked': False,
+        'game_name': None, 'participants_swappable': False, 'team_convertable': False,
+        'group_stages_were_started': False, 'locked_at': None, 'event_id': None,
+        'public_predictions_before_start_time': False, 'ranked': False, 'grand_finals_modifier': None,
+        'predict_the_losers_bracket': False}
+
+    def _get_tournament(self, key):
+        if key.isdigit():
+            t = self.tournaments.get(int(key))
+            if t is not None:
+                return t
+        for t in self.tournaments.values():
+            if t['url'] == key and t['subdomain'] is None:
+                return t
+        for t in self.tournaments.values():
+            if t['subdomain'] is not None and key == '{}-{}'.format(t['subdomain'], t['url']):
+                return t
+        raise _Error(404, 'Requested tournament not found')
+
+    def _list_tournaments(self, params):
+        subdomain = params.get('subdomain')
+        states = _LIST_STATES.get(params.get('state', 'all'))
+        return [self._tournament_json(t, params) for t in self.tournaments.values()
+                if t['subdomain'] == subdomain and (states is None or t['state'] in states)]
+
+    def _tournament_json(self, t, params):
+        data = {k: v for k, v in t.items() if not k.startswith('_')}
+        data['participants_count'] = len(self.participants[t['id']])
+        if params.get('include_participants'):
+            data['participants'] = [self._participant_json(p) for p in self.participants[t['id']]]
+        if params.get('include_matches'):
+            data['matches'] = [self._match_json(m) for m in self.matches[t['id']]]
+        return {'tournament': data}
+
+    def _check_url(self, url, subdomain, t_id=None):
+        if not url or not re.match(r'^\w+$', url):
+            raise _Error(422, 'URL can only contain letters, numbers and underscores')
+        for t in self.tournaments.values():
+            if t['id'] != t_id and t['url'] == url and t['subdomain'] == subdomain:
+                raise _Error(422, 'URL is already taken')
+
+    def _create_tournament(self, params):
+        values = params.get('tournament', {})
+        if not values.get('name'):
+            raise _Error(422, "Name can't be blank")
+        self._check_url(values.get('url'), values.get('subdomain'))
+
+        now = self._now()
+        t = dict(self._tournament_defaults)
+        t.update({'id': self._new_id(), 'created_at': now, 'updated_at': now})
+        t.update(values)
+        self._set_challonge_url(t)
+        self.tournaments[t['id']] = t
+        self.participants[t['id']] = []
+        self.matches[t['id']] = []
+        return self._tournament_json(t, params)
+
+    @staticmethod
+    def _set_challonge_url(t):
+        if t['subdomain']:
+            t['full_challonge_url'] = 'https://{}.challonge.com/{}'.format(t['subdomain'], t['url'])
+        else:
+            t['full_challonge_url'] = 'https://challonge.com/{}'.format(t['url'])
+
+    def _update_tournament(self, t, params):
+        values = params.get('tournament', {})
+        if 'url' in values or 'subdomain' in values:
+            self._check_url(values.get('url', t['url']), values.get('subdomain', t['subdomain']), t['id'])
+        if 'tournament_type' in values and t['state'] != 'pending':
+            raise _Error(422, 'Tournament type cannot be changed once the tournament has started')
+        t.update(values)
+        self._set_challonge_url(t)
+        t['updated_at'] = self._now()
+        return self._tournament_json(t, params)
+
+    def _destroy_tournament(self, t):
+        data = self._tournament_json(t, {})
+        del self.tournaments[t['id']]
+        for m in self.matches.pop(t['id']):
+            self.attachments.pop(m['id'], None)
+        del self.participants[t['id']]
+        return data
+
+    def _start(self, t):
+        if t['state'] not in ('pending', 'checking_in', 'checked_in'):
+            raise _Error(422, 'Tournament has already been started')
+        players = [p for p in self.participants[t['id']] if p['active']]
+        if len(players) < 2:
+            raise _Error(422, 'Tournament must have at least 2 participants')
+        t['state'] = 'underway'
+        t['started_at'] = self._now()
+        self.matches[t['id']] = []
+        builders = {
+            'single elimination': self._build_elimination,
+            'double elimination': self._build_elimination,
+            'round robin': self._build_round_robin,
+            'swiss': self._build_swiss_round,
+        }
+        builders[t['tournament_type']](t, players)
+        self._open_ready_matches(t)
+
+    def _reset(self, t):
+        for m in self.matches[t['id']]:
+            self.attachments.pop(m['id'], None)
+        self.matches[t['id']] = []
+        for p in self.participants[t['id']]:
+            p['final_rank'] = None
+        t.update({'state': 'pending', 'started_at': None, 'completed_at': None})
+
+    def _finalize(self, t):
+        if t['state'] not in ('underway', 'awaiting_review'):
+            raise _Error(422, 'Tournament is not underway')
+        if any(m['state'] != 'complete' for m in self.matches[t['id']]):
+            raise _Error(422, 'All matches must be completed before finalizing')
+        self._rank(t)
+        t['state'] = 'complete'
+        t['completed_at'] = self._now()
+
+    def _process_check_ins(self, t):
+        for p in self.participants[t['id']]:
+            if p['checked_in_at'] is None:
+                p['active'] = False
+        self._reseed(t['id'], sorted(self.participants[t['id']], key=lambda p: not p['active']))
+        t['state'] = 'checked_in'
+
+    def _abort_check_in(self, t):
+        for p in self.participants[t['id']]:
+            p.update({'active': True, 'checked_in_at': None, 'checked_in': False})
+        t['state'] = 'pending'
+
+    _tournament_actions = {
+        'start': _start,
+        'reset': _reset,
+        'finalize': _finalize,
+        'process_check_ins': _process_check_ins,
+        'abort_check_in': _abort_check_in,
+    }
+
+    # ------------------------------------------------------------------
+    # participants
+
+    def _participant_json(self, p):
+        return {'participant': dict(p)}
+
+    def _get_participant(self, t, key):
+        for p in self.participants[t['id']]:
+            if str(p['id']) == key:
+                return p
+        raise _Error(404, 'Requested participant not found')
+
+    def _reseed(self, t_id, ordered):
+        self.participants[t_id] = ordered
+        for i, p in enumerate(ordered, 1):
+            p['seed'] = i
+
+    def _dispatch_participants(self, method, t, rest, params):
+        if not rest:
+            if method == 'GET':
+                return [self._participant_json(p) for p in self.participants[t['id']]]
+            if method == 'POST':
+                return self._participant_json(self._add_participant(t, params.get('participant', {})))
+        elif rest == ['bulk_add'] and method == 'POST':
+            return [self._participant_json(self._add_participant(t, values)) for values in params.get('participants', [])]
+        elif rest == ['randomize'] and method == 'POST':
+            self._check_pending(t)
+            ordered = list(self.participants[t['id']])
+            self.random.shuffle(ordered)
+            self._reseed(t['id'], ordered)
+            return [self._participant_json(p) for p in ordered]
+        elif rest == ['clear'] and method == 'DELETE':
+            self._check_pending(t)
+            self.participants[t['id']] = []
+            return {'message': 'Participants cleared'}
+        else:
+            p = self._get_participant(t, rest[0])
+            if len(rest) == 1:
+                if method == 'GET':
+                    return self._participant_json(p)
+                if method == 'PUT':
+                    return self._participant_json(self._update_participant(t, p, params.get('participant', {})))
+                if method == 'DELETE':
+                    self._check_pending(t)
+                    self._reseed(t['id'], [e for e in self.participants[t['id']] if e is not p])
+                    return self._participant_json(p)
+            elif rest[1] in ('check_in', 'undo_check_in') and method == 'POST':
+                checked = rest[1] == 'check_in'
+                p.update({'checked_in_at': self._now() if checked else None, 'checked_in': checked,
+                          'updated_at': self._now()})
+                return self._participant_json(p)
+        raise _Error(404, 'Not found')
+
+    @staticmethod
+    def _check_pending(t):
+        if t['state'] not in ('pending', 'checking_in', 'checked_in'):
+            raise _Error(422, 'Participants cannot be modified once the tournament has started')
+
+    def _add_participant(self, t, values):
+        self._check_pending(t)
+        name = values.get('name') or values.get('challonge_username') or values.get('invite_name_or_email')
+        if not name:
+            raise _Error(422, "Name can't be blank")
+        if any(p['name'] == name for p in self.participants[t['id']]):
+            raise _Error(422, 'Name has already been taken')
+        if t['signup_cap'] and len(self.participants[t['id']]) >= t['signup_cap']:
+            raise _Error(422, 'Tournament is full')
+
+        now = self._now()
+        p = {'active': True, 'checked_in_at': None, 'created_at': now, 'final_rank': None, 'group_id': None,
+             'icon': None, 'id': self._new_id(), 'invitation_id': None, 'invite_email': None, 'misc': None,
+             'name': name, 'on_waiting_list': False, 'seed': None, 'tournament_id': t['id'], 'updated_at': now,
+             'challonge_username': None, 'challonge_email_address_verified': None, 'removable': True,
+             'participatable_or_invitation_attached': False, 'confirm_remove': True, 'invitation_pending': False,
+             'display_name_with_invitation_email_address': name, 'email_hash': None, 'username': None,
+             'attached_participatable_portrait_url': None, 'can_check_in': False, 'checked_in': False,
+             'reactivatable': False, 'display_name': name, 'group_player_ids': []}
+        self.participants[t['id']].append(p)
+        self._reseed(t['id'], self.participants[t['id']])
+        self._update_participant(t, p, {k: v for k, v in values.items() if k != 'name'})
+        return p
+
+    def _update_participant(self, t, p, values):
+        if values.get('name'):
+            p.update({'name': values['name'], 'display_name': values['name'],
+                      'display_name_with_invitation_email_address': values['name']})
+        if values.get('challonge_username'):
+            p.update({'challonge_username': values['challonge_username'], 'username': values['challonge_username'],
+                      'invitation_pending': True})
+        email = values.get('email') or values.get('invite_name_or_email')
+        if email and '@' in email:
+            p.update({'invite_email': email, 'email_hash': hashlib.md5(email.encode()).hexdigest()})
+        if 'misc' in values:
+            p['misc'] = values['misc']
+        if values.get('seed'):
+            self._check_pending(t)
+            ordered = [e for e in self.participants[t['id']] if e is not p]
+            seed = max(1, min(values['seed'], len(ordered) + 1))
+            ordered.insert(seed - 1, p)
+            self._reseed(t['id'], ordered)
+        p['updated_at'] = self._now()
+        return p
+
+    # ------------------------------------------------------------------
+    # matches
+
+    def _new_match(self, t, round_, player1=None, player2=None, prereq1=None, prereq2=None,
+                   loser1=False, loser2=False, **internal):
+        matches = self.matches[t['id']]
+        now = self._now()
+        m = {'attachment_count': 0, 'created_at': now, 'group_id': None, 'has_attachment': False,
+             'id': self._new_id(), 'identifier': self._identifier(len(matches)), 'location': None,
+             'loser_id': None, 'player1_id': player1, 'player1_is_prereq_match_loser': loser1,
+             'player1_prereq_match_id': prereq1, 'player1_votes': None, 'player2_id': player2,
+             'player2_is_prereq_match_loser': loser2, 'player2_prereq_match_id': prereq2, 'player2_votes': None,
+             'round': round_, 'scheduled_time': None, 'started_at': now, 'state': 'pending',
+             'tournament_id': t['id'], 'underway_at': None, 'updated_at': now, 'winner_id': None,
+             'prerequisite_match_ids_csv': ','.join(str(e) for e in (prereq1, prereq2) if e is not None),
+             'scores_csv': '', 'optional': False, 'rushb_id': None, 'completed_at': None,
+             'suggested_play_order': len(matches) + 1}
+        m.update(internal)
+        matches.append(m)
+        self.attachments[m['id']] = []
+        return m
+
+    @staticmethod
+    def _identifier(index):
+        identifier = ''
+        index += 1
+        while index:
+            index, rem = divmod(index - 1, 26)
+            identifier = chr(ord('A') + rem) + identifier
+        return identifier
+
+    def _pair(self, t, round_, a, b, **internal):
+        """ create a match between two sources
+
+        a source is None for a bye, ('player', id) for a known player or ('winner'/'loser', match) for a prerequisite
+        returns the source for whoever comes out of that pairing
+        """
+        if a is None or b is None:
+            return a or b
+        kwargs = dict(internal)
+        for i, src in ((1, a), (2, b)):
+            if src[0] == 'player':
+                kwargs['player{}'.format(i)] = src[1]
+            else:
+                kwargs['prereq{}'.format(i)] = src[1]['id']
+                kwargs['loser{}'.format(i)] = src[0] == 'loser'
+        m = self._new_match(t, round_, **kwargs)
+        return ('winner', m)
+
+    @staticmethod
+    def _bracket_positions(size):
+        seeds = [1]
+        while len(seeds) < size:
+            seeds = [x for s in seeds for x in (s, 2 * len(seeds) + 1 - s)]
+        return seeds
+
+    def _build_elimination(self, t, players):
+        rounds_count = max(1, math.ceil(math.log2(len(players))))
+        size = 2 ** rounds_count
+        sources = [('player', players[s - 1]['id']) if s <= len(players) else None
+                   for s in self._bracket_positions(size)]
+
+        losers_by_round = []
+        for r in range(1, rounds_count + 1):
+            next_sources = []
+            losers = []
+            for a, b in zip(sources[::2], sources[1::2]):
+                src = self._pair(t, r, a, b)
+                next_sources.append(src)
+                losers.append(('loser', src[1]) if a is not None and b is not None else None)
+            losers_by_round.append(losers)
+            sources = next_sources
+        champion = sources[0]
+
+        if t['tournament_type'] == 'single elimination':
+            if t['hold_third_place_match'] and rounds_count > 1:
+                self._pair(t, 0, *losers_by_round[-2], _third_place=True)
+            return
+
+        # losers bracket, rounds are negative on Challonge
+        lb_round = 0
+        lb_sources = losers_by_round[0]
+        if rounds_count > 1:
+            lb_round -= 1
+            lb_sources = [self._pair(t, lb_round, a, b) for a, b in zip(lb_sources[::2], lb_sources[1::2])]
+        for r in range(1, rounds_count):
+            lb_round -= 1
+            wb_losers = losers_by_round[r]
+            if r % 2:
+                wb_losers = list(reversed(wb_losers))
+            lb_sources = [self._pair(t, lb_round, a, b) for a, b in zip(lb_sources, wb_losers)]
+            if len(lb_sources) > 1:
+                lb_round -= 1
+                lb_sources = [self._pair(t, lb_round, a, b) for a, b in zip(lb_sources[::2], lb_sources[1::2])]
+
+        if t['grand_finals_modifier'] != 'skip':
+            self._pair(t, rounds_count + 1, champion, lb_sources[0])
+
+    def _build_round_robin(self, t, players):
+        ids = [p['id'] for p in players]
+        if len(ids) % 2:
+            ids.append(None)
+        half = len(ids) // 2
+        for r in range(1, len(ids)):
+            for a, b in zip(ids[:half], reversed(ids[half:])):
+                if a is not None and b is not None:
+                    self._new_match(t, r, a, b)
+            ids = [ids[0]] + [ids[-1]] + ids[1:-1]
+
+    def _swiss_points(self, t):
+        points = {p['id']: 0.0 for p in self.participants[t['id']] if p['active']}
+        for m in self.matches[t['id']]:
+            if m['state'] != 'complete':
+                continue
+            if m['winner_id'] is None:
+                points[m['player1_id']] += .5
+                points[m['player2_id']] += .5
+            else:
+                points[m['winner_id']] += 1.0
+        return points
+
+    def _build_swiss_round(self, t, players=None):
+        matches = self.matches[t['id']]
+        round_ = 1 + max((m['round'] for m in matches), default=0)
+        points = self._swiss_points(t)
+        played = {frozenset((m['player1_id'], m['player2_id'])) for m in matches}
+        if round_ == 1:
+            ordered = [p['id'] for p in self.participants[t['id']] if p['active']]
+            half = (len(ordered) + 1) // 2
+            ordered = [x for pair in zip(ordered[:half], ordered[half:]) for x in pair]
+        else:
+            ordered = sorted(points, key=lambda p_id: -points[p_id])
+        while len(ordered) > 1:
+            a = ordered.pop(0)
+            b = next((e for e in ordered if frozenset((a, e)) not in played), ordered[0])
+            ordered.remove(b)
+            self._new_match(t, round_, a, b)
+
+    def _swiss_rounds_count(self, t):
+        players = len([p for p in self.participants[t['id']] if p['active']])
+        return t['swiss_rounds'] or max(1, math.ceil(math.log2(players)))
+
+    def _match_json(self, m, include_attachments=False):
+        data = {k: v for k, v in m.items() if not k.startswith('_')}
+        if include_attachments:
+            data['attachments'] = [{'attachment': dict(a)} for a in self.attachments[m['id']]]
+        return {'match': data}
+
+    def _get_match(self, t, key):
+        for m in self.matches[t['id']]:
+            if str(m['id']) == key:
+                return m
+        raise _Error(404, 'Requested match not found')
+
+    def _dispatch_matches(self, method, t, rest, params):
+        include_attachments = params.get('include_attachments', False)
+        if not rest:
+            if method == 'GET':
+                state = params.get('state', 'all')
+                p_id = params.get('participant_id')
+                return [self._match_json(m, include_attachments) for m in self.matches[t['id']]
+                        if (state == 'all' or m['state'] == state)
+                        and (p_id is None or p_id in (m['player1_id'], m['player2_id']))]
+            raise _Error(404, 'Not found')
+
+        m = self._get_match(t, rest[0])
+        if len(rest) == 1:
+            if method == 'GET':
+                return self._match_json(m, include_attachments)
+            if method == 'PUT':
+                return self._match_json(self._update_match(t, m, params.get('match', {})))
+        elif rest[1] == 'attachments':
+            return self._dispatch_attachments(method, t, m, rest[2:], params)
+        elif len(rest) == 2 and method == 'POST':
+            if rest[1] == 'reopen':
+                self._reopen(t, m)
+                return self._match_json(m)
+            if rest[1] in ('mark_as_underway', 'unmark_as_underway'):
+                m['underway_at'] = self._now() if rest[1] == 'mark_as_underway' else None
+                m['updated_at'] = self._now()
+                return self._match_json(m)
+        raise _Error(404, 'Not found')
+
+    def _update_match(self, t, m, values):
+        for k in ('player1_votes', 'player2_votes', 'scores_csv'):
+            if k in values:
+                m[k] = values[k]
+        winner = values.get('winner_id')
+        if winner is not None:
+            if winner == 'tie':
+                if t['tournament_type'] not in ('round robin', 'swiss'):
+                    raise _Error(422, 'Ties are only allowed in round robin and swiss tournaments')
+                m['winner_id'], m['loser_id'] = None, None
+            else:
+                winner = int(winner)
+                if winner not in (m['player1_id'], m['player2_id']) or None in (m['player1_id'], m['player2_id']):
+                    raise _Error(422, 'Winner must be one of the players of the match')
+                m['winner_id'] = winner
+                m['loser_id'] = m['player2_id'] if winner == m['player1_id'] else m['player1_id']
+            m['state'] = 'complete'
+            m['completed_at'] = self._now()
+            self._advance(t, m)
+        m['updated_at'] = self._now()
+        return m
+
+    def _dependents(self, t, m):
+        for d in self.matches[t['id']]:
+            for i in (1, 2):
+                if d['player{}_prereq_match_id'.format(i)] == m['id']:
+                    yield d, i
+
+    def _advance(self, t, m):
+        for d, i in self._dependents(t, m):
+            from_loser = d['player{}_is_prereq_match_loser'.format(i)]
+            d['player{}_id'.format(i)] = m['loser_id'] if from_loser else m['winner_id']
+            if d['player1_id'] is not None and d['player2_id'] is not None and d['state'] == 'pending':
+                d['state'] = 'open'
+            d['updated_at'] = self._now()
+
+        if t['tournament_type'] == 'swiss':
+            current = [e for e in self.matches[t['id']] if e['round'] == m['round']]
+            if all(e['state'] == 'complete' for e in current) and m['round'] < self._swiss_rounds_count(t):
+                self._build_swiss_round(t)
+                self._open_ready_matches(t)
+
+    def _open_ready_matches(self, t):
+        # like Challonge, a match opens as soon as both its players are known
+        for m in self.matches[t['id']]:
+            if m['state'] == 'pending' and m['player1_id'] is not None and m['player2_id'] is not None:
+                m['state'] = 'open'
+
+    def _reopen(self, t, m):
+        if m['state'] != 'complete':
+            raise _Error(422, 'Only completed matches can be reopened')
+        for d, i in self._dependents(t, m):
+            if d['state'] == 'complete':
+                self._reopen(t, d)
+            d['player{}_id'.format(i)] = None
+            d['state'] = 'pending'
+            d['updated_at'] = self._now()
+        m.update({'state': 'open', 'winner_id': None, 'loser_id': None, 'completed_at': None,
+                  'updated_at': self._now()})
+
+    def _rank(self, t):
+        participants = self.participants[t['id']]
+        matches = self.matches[t['id']]
+        if t['tournament_type'] in ('round robin', 'swiss'):
+            points = self._swiss_points(t)
+            for p in participants:
+                if p['id'] in points:
+                    p['final_rank'] = 1 + sum(1 for v in points.values() if v > points[p['id']])
+            return
+
+        next_match = {}
+        fed_losers = set()
+        for m in matches:
+            for i in (1, 2):
+                prereq = m['player{}_prereq_match_id'.format(i)]
+                if prereq is not None:
+                    if m['player{}_is_prereq_match_loser'.format(i)]:
+                        fed_losers.add(prereq)
+                    else:
+                        next_match[prereq] = m['id']
+
+        def distance(m_id):
+            d = 0
+            while m_id in next_match:
+                m_id = next_match[m_id]
+                d += 1
+            return d
+
+        keys = {p['id']: (-1, 0) for p in participants if p['active']}
+        for m in matches:
+            if m.get('_third_place'):
+                keys[m['winner_id']] = (.5, 0)
+                keys[m['loser_id']] = (.5, 1)
+            elif m['id'] not in fed_losers and m['loser_id'] is not None:
+                keys[m['loser_id']] = (distance(m['id']), 0)
+        losses = {p_id: 0 for p_id in keys}
+        for m in matches:
+            if m['loser_id'] in losses:
+                losses[m['loser_id']] += 1
+        for p_id, key in keys.items():
+            if key[0] < 0:
+                keys[p_id] = (-1, losses[p_id])
+        for p in participants:
+            if p['id'] in keys:
+                p['final_rank'] = 1 + sum(1 for k in keys.values() if k < keys[p['id']])
+
+    # ------------------------------------------------------------------
+    # attachments
+
+    def _dispatch_attachments(self, method, t, m, rest, params):
+        values = params.get('match_attachment', {})
+        if not rest and method == 'POST':
+            if not t['accept_attachments']:
+                raise _Error(422, 'Attachments are not allowed for this tournament')
+            now = self._now()
+            a = {'id': self._new_id(), 'match_id': m['id'], 'user_id': 1, 'description': None, 'url': None,
+                 'original_file_name': None, 'created_at': now, 'updated_at': now, 'asset_file_name': None,
+                 'asset_content_type': None, 'asset_file_size': None, 'asset_url': None}
+            self._update_attachment(a, values)
+            self.attachments[m['id']].append(a)
+            self._count_attachments(m)
+            return {'match_attachment': dict(a)}
+        if not rest and method == 'GET':
+            return [{'match_attachment': dict(a)} for a in self.attachments[m['id']]]
+        if len(rest) == 1:
+            a = next((a for a in self.attachments[m['id']] if str(a['id']) == rest[0]), None)
+            if a is None:
+                raise _Error(404, 'Requested attachment not found')
+            if method == 'PUT':
+                self._update_attachment(a, values)
+            elif method == 'DELETE':
+                self.attachments[m['id']].remove(a)
+                self._count_attachments(m)
+            return {'match_attachment': dict(a)}
+        raise _Error(404, 'Not found')
+
+    def _update_attachment(self, a, values):
+        if 'asset' in values:
+            asset = values['asset']
+            size = len(asset) if isinstance(asset, (bytes, str)) else None
+            a.update({'asset_file_name': 'asset', 'asset_file_size': size,
+                      'asset_url': '//s3.amazonaws.com/challonge_app/match_attachments/{}/asset'.format(a['id'])})
+        elif 'url' in values:
+            a['url'] = values['url']
+        if 'description' in values:
+            a['description'] = values['description']
+        a['updated_at'] = self._now()
+
+    def _count_attachments(self, m):
+        m['attachment_count'] = len(self.attachments[m['id']])
+        m['has_attachment'] = m['attachment_count'] > 0
+        m['updated_at'] = self._now()
@@ -1,5 +1,11 @@
-import aiohttp
+import collections
+import datetime
+import functools
+import hashlib
+import itertools
 import logging
+import time
+import weakref
 
 import challonge
 
@@ -13,12 +19,47 @@ class APIException(Exception):
     pass
 
 
+class CircuitOpenError(APIException):
+    """ Raised instead of sending a request while the :class:`CircuitBreaker` of the connection is open """
+    pass
+
+
+class BulkAddError(APIException):
+    """ Raised by :func:`Tournament.add_participants` when a request failed, the next ones are not sent
+
+    Attributes:
+        added: the participant created for each given one, None for the ones that were not created
+
+    """
+
+    def __init__(self, message, added):
+        super().__init__(message, added)
+        self.added = added
+
+
+# exceptions not raised because USE_EXCEPTIONS is False, by task, so that run_bulk can see them
+_suppressed = weakref.WeakKeyDictionary()
+
+
+def _current_task():
+    import asyncio
+    current_task = getattr(asyncio, 'current_task', None) or asyncio.Task.current_task
+    try:
+        return current_task()
+    except RuntimeError:
+        # no running loop
+        return None
+
+
 def assert_or_raise(cond, exc, *args):
     if challonge.USE_EXCEPTIONS is not None and not cond:
         if challonge.USE_EXCEPTIONS:
             raise exc(*args)
         else:
             log.warning('An exception `{}` has been raised: `{}`'.format(exc.__name__, args))
+            task = _current_task()
+            if task is not None:
+                _suppressed[task] = exc(*args)
 
 
 class FieldDescriptor:
@@ -30,13 +71,202 @@ class FieldDescriptor:
         return getattr(instance, self.attr) if instance else self
 
 
+def _holder_eq(self, other):
+    if type(other) is not type(self):
+        return NotImplemented
+    return self._id == other._id
+
+
+def _holder_hash(self):
+    return hash((type(self), self._id))
+
+
+def _json_id(json_def):
+    """ id of the model in a `{'model_name': {...}}` API answer """
+    if isinstance(json_def, dict) and len(json_def) == 1:
+        data = next(iter(json_def.values()))
+        if isinstance(data, dict):
+            return data.get('id')
+    return None
+
+
+def get_holder(connection, holder_class, json_def, **kwargs):
+    """ the live instance of `holder_class` with the id given in `json_def`, refreshed, or a new one
+
+    Every :class:`Connection` keeps a weak-valued map of the models created through it,
+    so that there is only one object per (type, id) as long as it is referenced somewhere.
+
+    """
+    identity_map = getattr(connection, 'identity_map', None)
+    h_id = _json_id(json_def) if identity_map is not None else None
+    if h_id is None:
+        return holder_class(connection, json_def, **kwargs)
+
+    holder = identity_map.get((holder_class, h_id))
+    if holder is None:
+        holder = holder_class(connection, json_def, **kwargs)
+        identity_map[(holder_class, h_id)] = holder
+    else:
+        holder._refresh_from_json(json_def)
+    return holder
+
+
+class HolderList(list):
+    """ list of models indexed by id
+
+    Membership tests and :func:`find` use the index instead of comparing every element.
+
+    """
+
+    def __init__(self, iterable=()):
+        super().__init__(iterable)
+        self._reindex()
+
+    def _reindex(self):
+        self._index = {e._id: e for e in self}
+
+    def __reduce__(self):
+        # the default protocol appends the elements before restoring the attributes, i.e. without an index
+        return self.__class__, (list(self),)
+
+    def find(self, e_id):
+        """ the element with the id `e_id`, None if there is none """
+        return self._index.get(e_id)
+
+    def __contains__(self, e):
+        found = self._index.get(getattr(e, '_id', None))
+        return found is not None and (found is e or found == e)
+
+    def append(self, e):
+        super().append(e)
+        self._index[e._id] = e
+
+    def extend(self, iterable):
+        iterable = list(iterable)
+        super().extend(iterable)
+        self._index.update((e._id, e) for e in iterable)
+
+    def __iadd__(self, iterable):
+        self.extend(iterable)
+        return self
+
+    def insert(self, i, e):
+        super().insert(i, e)
+        self._index[e._id] = e
+
+    def remove(self, e):
+        """ remove `e`, a missing element is detected in O(1)
+
+        Removing from a list is still O(n): the order is kept (e.g. the participants by seed), so the position
+        is looked for with identity checks only (no call to __eq__) and the elements after it are shifted.
+
+        """
+        found = self._index.get(getattr(e, '_id', None))
+        if found is None or not (found is e or found == e):
+            raise ValueError('{!r} is not in list'.format(e))
+        del self[next(i for i, x in enumerate(self) if x is found)]
+
+    def pop(self, i=-1):
+        e = super().pop(i)
+        self._index.pop(e._id, None)
+        return e
+
+    def clear(self):
+        super().clear()
+        self._index = {}
+
+    def __setitem__(self, i, value):
+        super().__setitem__(i, value)
+        self._reindex()
+
+    def __delitem__(self, i):
+        if isinstance(i, slice):
+            super().__delitem__(i)
+            self._reindex()
+        else:
+            self._index.pop(self[i]._id, None)
+            super().__delitem__(i)
+
+
+class BulkResult:
+    """ Outcome of a bulk operation: what succeeded and what failed, in the order of the items
+
+    Attributes:
+        succeeded: items whose request succeeded
+        failed: ``(item, exception)`` for the items whose request failed
+        skipped: items not sent because of an earlier failure, see `stop_on_failure` of :func:`run_bulk`
+
+    """
+
+    def __init__(self):
+        self.succeeded = []
+        self.failed = []
+        self.skipped = []
+
+    def __bool__(self):
+        """ True when nothing failed """
+        return not self.failed
+
+    def __repr__(self):
+        return 'BulkResult(succeeded={}, failed={}, skipped={})'.format(len(self.succeeded), len(self.failed), len(self.skipped))
+
+
+async def run_bulk(items, operation, concurrency: int = 8, stop_on_failure: bool = False) -> BulkResult:
+    """ await `operation(item)` for every item, at most `concurrency` at the same time
+
+    API and network errors of an item are collected in the result, they do not stop the others
+    unless `stop_on_failure` is set: the items not started yet are then skipped.
+    When `USE_EXCEPTIONS` is False, the errors that were only logged are collected as well.
+
+    |funccoro|
+
+    """
+    import asyncio
+    import aiohttp
+    items = list(items)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    outcomes = [None] * len(items)
+    skipped = object()
+    stopped = []
+
+    async def run(i, item):
+        async with semaphore:
+            if stopped:
+                outcomes[i] = skipped
+                return
+            # each item runs in its own task
+            task = _current_task()
+            _suppressed.pop(task, None)
+            try:
+                await operation(item)
+            except (APIException, asyncio.TimeoutError, aiohttp.ClientError, OSError) as e:
+                outcomes[i] = e
+            else:
+                outcomes[i] = _suppressed.pop(task, None)
+            if outcomes[i] is not None and stop_on_failure:
+                stopped.append(True)
+
+    await asyncio.gather(*[run(i, item) for i, item in enumerate(items)])
+    result = BulkResult()
+    for item, e in zip(items, outcomes):
+        if e is None:
+            result.succeeded.append(item)
+        elif e is skipped:
+            result.skipped.append(item)
+        else:
+            result.failed.append((item, e))
+    return result
+
+
 class FieldHolder(type):
     private_name = '_{}'
 
     def _create_holder(self, holder_class, json_def, **kwargs):
-        return holder_class(self.connection, json_def, **kwargs)
+        return get_holder(self.connection, holder_class, json_def, **kwargs)
 
     def _find_holder(self, local_list, e_id):
+        if isinstance(local_list, HolderList):
+            return local_list.find(int(e_id))
         if local_list is not None:
             for e in local_list:
                 if e.id == int(e_id):
@@ -54,24 +284,248 @@ class FieldHolder(type):
         cls._create_holder = FieldHolder._create_holder
         cls._find_holder = FieldHolder._find_holder
         cls._get_from_dict = FieldHolder._get_from_dict
-        cls.__eq__ = lambda self, other: self._id == other._id
+        # equal models have the same type and id, they hash the same so they can go in sets and dicts
+        cls.__eq__ = _holder_eq
+        cls.__hash__ = _holder_hash
 
         if challonge.USE_FIELDS_DESCRIPTORS:
             for a in cls._fields:
                 setattr(cls, a, FieldDescriptor(FieldHolder.private_name.format(a)))
 
 
+# path segments that are actions and not ids even though they come right after a collection name
+_COLLECTION_ACTIONS = {'bulk_add', 'randomize', 'clear'}
+
+
+@functools.lru_cache(maxsize=1024)
+def endpoint_of(uri: str) -> str:
+    """ uri with its ids replaced by a placeholder: `tournaments/123/matches/4` -> `tournaments/{id}/matches/{id}` """
+    parts = uri.split('/')
+    for i in range(1, len(parts), 2):
+        if parts[i] not in _COLLECTION_ACTIONS:
+            parts[i] = '{id}'
+    return '/'.join(parts)
+
+
+class RequestEvent:
+    """ Data about one API request, given to the :class:`Connection` hooks
+
+    :attr:`phases` maps the connection-level phases reported by aiohttp to their duration in seconds:
+
+    * ``dns``: host name resolution (absent when cached)
+    * ``pool_wait``: time spent waiting for a free connection because the pool limit was reached
+    * ``connect``: opening a new connection, TLS handshake included (absent when a connection was reused)
+    * ``ttfb``: from getting a connection (new or reused) to receiving the response headers,
+      so it does not overlap the phases above
+
+    """
+    __slots__ = ['method', 'uri', 'endpoint', 'started_at', 'elapsed', 'status',
+                 'bytes_out', 'bytes_in', 'decode_time', 'exception', 'phases', 'connection_reused']
+
+    def __init__(self, method: str, uri: str, bytes_out: int):
+        self.method = method
+        self.uri = uri
+        self.endpoint = endpoint_of(uri)
+        self.started_at = time.perf_counter()
+        self.elapsed = None
+        self.status = None
+        self.bytes_out = bytes_out
+        self.bytes_in = 0
+        self.decode_time = 0.0
+        self.exception = None
+        self.phases = {}
+        self.connection_reused = False
+
+
+def _trace_phase(name: str, start_signals, end_signal):
+    async def on_start(session, context, params):
+        context.phase_starts = getattr(context, 'phase_starts', {})
+        context.phase_starts[name] = time.perf_counter()
+
+    async def on_end(session, context, params):
+        event = context.trace_request_ctx
+        start = getattr(context, 'phase_starts', {}).pop(name, None)
+        if isinstance(event, RequestEvent) and start is not None:
+            event.phases[name] = time.perf_counter() - start
+
+    for start_signal in start_signals:
+        start_signal.append(on_start)
+    end_signal.append(on_end)
+
+
+def _make_trace_config():
+    import aiohttp
+    trace_config = aiohttp.TraceConfig()
+    _trace_phase('dns', [trace_config.on_dns_resolvehost_start], trace_config.on_dns_resolvehost_end)
+    _trace_phase('pool_wait', [trace_config.on_connection_queued_start], trace_config.on_connection_queued_end)
+    _trace_phase('connect', [trace_config.on_connection_create_start], trace_config.on_connection_create_end)
+    # aiohttp signals the request start before getting a connection: wait until one is held
+    _trace_phase('ttfb', [trace_config.on_connection_reuseconn, trace_config.on_connection_create_end],
+                 trace_config.on_request_end)
+
+    async def on_reuse(session, context, params):
+        if isinstance(context.trace_request_ctx, RequestEvent):
+            context.trace_request_ctx.connection_reused = True
+
+    trace_config.on_connection_reuseconn.append(on_reuse)
+    return trace_config
+
+
+class CircuitBreaker:
+    """ Stops sending requests to the Challonge API while it keeps failing
+
+    The outcome of the last `window` requests is kept. Once at least `min_requests` of them are known and
+    the ratio of failures reaches `failure_rate`, the circuit **opens**: requests fail at once with
+    :class:`CircuitOpenError` instead of waiting for the API. After `reset_timeout` seconds it becomes
+    **half open** and lets `half_open_probes` requests through: if they all succeed the circuit closes,
+    if one fails it opens again.
+
+    Only 5xx responses, timeouts and connection errors are failures, other error statuses are the caller's fault.
+
+    Args:
+        failure_rate: ratio of failed requests in the window that opens the circuit
+        window: number of most recent requests taken into account
+        min_requests: the circuit never opens with fewer requests in the window
+        reset_timeout: seconds before an open circuit lets probe requests through
+        half_open_probes: number of successful probes needed to close the circuit
+
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate: float = .5, window: int = 20, min_requests: int = 10,
+                 reset_timeout: float = 30.0, half_open_probes: int = 1):
+        self.failure_rate = failure_rate
+        self.window = window
+        self.min_requests = min(min_requests, window)
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+
+        self.opened_count = 0
+        self.rejected_count = 0
+        self._outcomes = collections.deque(maxlen=window)
+        self._state = CircuitBreaker.CLOSED
+        self._opened_at = None
+        self._probes_in_flight = 0
+        self._probes_succeeded = 0
+        self._half_open_generation = 0
+
+    @property
+    def state(self) -> str:
+        """ one of ``closed``, ``open`` and ``half_open`` """
+        if self._state == CircuitBreaker.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = CircuitBreaker.HALF_OPEN
+            self._probes_in_flight = 0
+            self._probes_succeeded = 0
+            self._half_open_generation += 1
+        return self._state
+
+    @property
+    def failures(self) -> int:
+        """ number of failed requests in the window """
+        return self._outcomes.count(False)
+
+    def reset(self):
+        """ close the circuit and forget the past requests """
+        self._state = CircuitBreaker.CLOSED
+        self._outcomes.clear()
+
+    def _open(self):
+        self._state = CircuitBreaker.OPEN
+        self._opened_at = time.monotonic()
+        self.opened_count += 1
+        log.warning('Circuit opened after {} failures in {} requests'.format(self.failures, len(self._outcomes)))
+
+    def _acquire(self):
+        """ a permit to give back to :func:`_release` if a request can be sent now, None otherwise
+
+        The permit of a probe is the number of the half open period it belongs to, it is 0 for other requests.
+
+        """
+        state = self.state
+        if state == CircuitBreaker.CLOSED:
+            return 0
+        if state == CircuitBreaker.HALF_OPEN and self._probes_in_flight + self._probes_succeeded < self.half_open_probes:
+            self._probes_in_flight += 1
+            return self._half_open_generation
+        self.rejected_count += 1
+        return None
+
+    def _release(self, permit: int, success: bool = None):
+        """ record the outcome of a request allowed by :func:`_acquire`, `None` when it got no answer for other reasons
+
+        Only the probes of the current half open period decide whether the circuit closes, requests sent
+        while the circuit was closed only count if it is still closed when they end.
+
+        """
+        if permit:
+            if self._state != CircuitBreaker.HALF_OPEN or permit != self._half_open_generation:
+                return
+            self._probes_in_flight -= 1
+            if success is False:
+                self._open()
+            elif success:
+                self._probes_succeeded += 1
+                if self._probes_succeeded >= self.half_open_probes:
+                    log.info('Circuit closed')
+                    self.reset()
+        elif self._state == CircuitBreaker.CLOSED and success is not None:
+            self._outcomes.append(success)
+            if len(self._outcomes) >= self.min_requests and self.failures >= self.failure_rate * len(self._outcomes):
+                self._open()
+
+
 class Connection:
+    """ Sends the requests to the Challonge API
+
+    Hooks can be appended to :attr:`on_request_start`, :attr:`on_request_end` and :attr:`on_request_error`.
+    They are called synchronously with a :class:`RequestEvent`, and must not raise.
+    Connection-level timings (see :attr:`RequestEvent.phases`) are traced while at least one hook is registered.
+
+    By default every request opens its own HTTP session. With `keep_alive`, one session and its pool
+    of at most `pool_limit` connections is kept open until :func:`close` is called.
+
+    With a `circuit_breaker`, requests fail fast with :class:`CircuitOpenError` while the API is degraded.
+
+    With a `cache` (a :class:`CacheStore`), the answers of GET requests are stored and served again
+    until they expire. Stored answers are tagged with the tournaments they hold, so any other request on a tournament
+    forgets what was stored about it, whether it was fetched by id or by url, as well as the tournament lists.
+    Stores like :class:`SQLiteCacheStore` can be shared by the connections of several processes.
+
+    """
     challonge_api_url = 'https://api.challonge.com/v1/{}.json'
 
-    def __init__(self, username: str, api_key: str, timeout, loop):
+    def __init__(self, username: str, api_key: str, timeout, loop, keep_alive: bool = False, pool_limit: int = 100,
+                 circuit_breaker: CircuitBreaker = None, cache=None):
         self.username = username
         self.api_key = api_key
         self.timeout = timeout
         self.loop = loop
+        self.keep_alive = keep_alive
+        self.pool_limit = pool_limit
+        self.circuit_breaker = circuit_breaker
+        self.cache = cache
+        self.identity_map = weakref.WeakValueDictionary()
 
-    async def __call__(self, method: str, uri: str, params_prefix: str =None, **params):
-        """ response codes:
+        self.on_request_start = []
+        self.on_request_end = []
+        self.on_request_error = []
+
+        self._session = None
+        self._session_loop = None
+        self._trace_config = None
+
+    @property
+    def instrumented(self) -> bool:
+        return bool(self.on_request_start or self.on_request_end or self.on_request_error)
+
+    async def __call__(self, method: str, uri: str, params_prefix: str =None, use_cache: bool = True,
+                       store_in_cache: bool = True, **params):
+        """ `use_cache` set to False fetches a fresh answer even if the :attr:`cache` has one,
+        `store_in_cache` set to False does not keep the answer in the :attr:`cache`
+
+        response codes:
         200 - OK
         401 - Unauthorized (Invalid API key or insufficient permissions)
         404 - Object not found within your account scope
@@ -81,37 +535,218 @@ class Connection:
         """
         params = self._prepare_params(params, params_prefix)
 
+        if self.cache is not None:
+            return await self._cached_call(method, uri, params, use_cache, store_in_cache)
+        return await self._call(method, uri, params)
+
+    async def _cached_call(self, method: str, uri: str, params: list, use_cache: bool, store_in_cache: bool):
+        if method == 'GET':
+            key = self._cache_key(uri, params)
+            resp = self.cache.get(key) if use_cache else None
+            if resp is None:
+                resp = await self._call(method, uri, params)
+                if store_in_cache and _is_success(resp):
+                    # tagged with the tournaments it is about, whether they were asked by id or by url
+                    tags = [self._cache_tag(t_id) for t_id in _tournament_ids(resp)]
+                    self.cache.set(key, resp, tags=tags)
+            return resp
+
+        resp = None
+        try:
+            resp = await self._call(method, uri, params)
+            return resp
+        finally:
+            # even a failed request may have changed something
+            parts = uri.split('/')
+            prefix = '{} {}'.format(self._cache_namespace(), parts[0])
+            self.cache.delete_prefix(prefix + '?')
+            t_ids = _tournament_ids(resp)
+            if len(parts) > 1:
+                self.cache.delete_prefix('{}/{}?'.format(prefix, parts[1]))
+                self.cache.delete_prefix('{}/{}/'.format(prefix, parts[1]))
+                if parts[1].isdigit():
+                    t_ids.add(int(parts[1]))
+            for t_id in t_ids:
+                self.cache.delete_tag(self._cache_tag(t_id))
+
+    def _cache_namespace(self) -> str:
+        # an answer is only served to the same credentials
+        return '{}:{}'.format(self.username, hashlib.sha256(str(self.api_key).encode()).hexdigest()[:16])
+
+    def _cache_tag(self, t_id: int) -> str:
+        return '{} tournament:{}'.format(self._cache_namespace(), t_id)
+
+    def _cache_key(self, uri: str, params: list) -> str:
+        return '{} {}?{}'.format(self._cache_namespace(), uri, '&'.join('{}={}'.format(k, v) for k, v in sorted(params)))
+
+    async def _call(self, method: str, uri: str, params: list):
+        if not self.instrumented:
+            return await self._request(method, uri, params)
+
+        event = RequestEvent(method, uri, sum(len(k) + len(v) + 2 for k, v in params))
+        for hook in self.on_request_start:
+            hook(event)
+        try:
+            resp = await self._request(method, uri, params, event)
+        except BaseException as e:
+            event.elapsed = time.perf_counter() - event.started_at
+            event.exception = e
+            for hook in self.on_request_error:
+                hook(event)
+            raise
+        event.elapsed = time.perf_counter() - event.started_at
+        for hook in self.on_request_end:
+            hook(event)
+        return resp
+
+    def _new_session(self, traced: bool):
+        # aiohttp is only imported once a request is made, it makes `import challonge` much faster
+        import aiohttp
+        if traced and self._trace_config is None:
+            self._trace_config = _make_trace_config()
+        return aiohttp.ClientSession(loop=self.loop,
+                                     timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                     connector=aiohttp.TCPConnector(limit=self.pool_limit),
+                                     trace_configs=[self._trace_config] if traced else None)
+
+    def _shared_session(self):
+        import asyncio
+        loop = self.loop or asyncio.get_event_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = self._new_session(traced=True)
+            self._session_loop = loop
+        return self._session
+
+    async def close(self):
+        """ close the session kept open by `keep_alive`
+
+        |methcoro|
+
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method: str, uri: str, params: list, event: RequestEvent = None):
+        breaker = self.circuit_breaker
+        if breaker is None:
+            return await self._open_and_send(method, uri, params, event)
+
+        permit = breaker._acquire()
+        if permit is None:
+            assert_or_raise(False, CircuitOpenError, 'Circuit open, request not sent', method, uri)
+            return None
+        import asyncio
+        import aiohttp
+        outcome = []
+        try:
+            return await self._open_and_send(method, uri, params, event, outcome)
+        except (asyncio.TimeoutError, aiohttp.ClientError, OSError):
+            if not outcome:
+                outcome.append(False)
+            raise
+        finally:
+            breaker._release(permit, outcome[0] if outcome else None)
+
+    async def _open_and_send(self, method: str, uri: str, params: list, event: RequestEvent = None, outcome: list = None):
+        if self.keep_alive:
+            return await self._send(self._shared_session(), method, uri, params, event, outcome)
+        async with self._new_session(traced=event is not None) as session:
+            return await self._send(session, method, uri, params, event, outcome)
+
+    async def _send(self, session, method: str, uri: str, params: list, event: RequestEvent = None, outcome: list = None):
+        import aiohttp
         # build the HTTP request and use basic authentication
         url = self.challonge_api_url.format(uri)
-
-        timeout = aiohttp.ClientTimeout(total=self.timeout)
-        async with aiohttp.ClientSession(loop=self.loop, timeout=timeout) as session:
-            auth = aiohttp.BasicAuth(login=self.username, password=self.api_key)
-            async with session.request(method, url, params=params, auth=auth) as response:
+        auth = aiohttp.BasicAuth(login=self.username, password=self.api_key)
+        params, data = _multipart(params)
+        async with session.request(method, url, params=params, data=data, auth=auth, trace_request_ctx=event) as response:
+            if outcome is not None:
+                outcome.append(response.status < 500)
+            if event is None:
                 resp = await response.json()
-                assert_or_raise(response.status in [200, 401, 404, 406, 422, 500], ValueError, 'Unknown API return code', resp, response.status, response.reason, uri, params)
-                assert_or_raise(response.status not in [401, 404, 406, 422, 500], APIException, resp, response.status, response.reason, uri, params)
-                return resp
+            else:
+                event.status = response.status
+                event.bytes_in = len(await response.read())
+                decode_start = time.perf_counter()
+                resp = await response.json()
+                event.decode_time = time.perf_counter() - decode_start
+            assert_or_raise(response.status in [200, 401, 404, 406, 422, 500], ValueError, 'Unknown API return code', resp, response.status, response.reason, uri, params)
+            assert_or_raise(response.status not in [401, 404, 406, 422, 500], APIException, resp, response.status, response.reason, uri, params)
+            return resp
 
     @staticmethod
-    def _prepare_params(params, prefix=None) -> dict:
-        def val(value):
-            if isinstance(value, bool):
-                # challonge only accepts lowercase true/false
-                value = str(value).lower()
-            return str(value)
-
-        new_params = []
-        if prefix:
-            if prefix.endswith('[]'):
-                for k, v in params.items():
-                    new_params.extend([('{}[{}]'.format(prefix, k), val(u)) for u in v])
-            else:
-                new_params = [('{}[{}]'.format(prefix, k), val(v)) for k, v in params.items()]
+    def _prepare_params(params, prefix=None) -> list:
+        if prefix and prefix.endswith('[]'):
+            columns = []
+            for k, values in params.items():
+                key = _param_key(prefix, k)
+                columns.append([None if v is None else (key, _encode_value(v)) for v in values])
+            if len(columns) == 1:
+                return [p for p in columns[0] if p is not None]
+            # Rails starts a new item of an array of hashes when one of its fields shows up again,
+            # so the fields of an item must be sent together. None values are left out: the first
+            # field must be given for every item
+            return [p for item in itertools.zip_longest(*columns) for p in item if p is not None]
+        return [(_param_key(prefix, k), _encode_value(v)) for k, v in params.items()]
+
+
+def _is_success(resp) -> bool:
+    # without exceptions (`USE_EXCEPTIONS`), a failed request returns the error body
+    return resp is not None and not (isinstance(resp, dict) and 'errors' in resp)
+
+
+def _tournament_ids(resp) -> set:
+    """ ids of the tournaments an API answer is about """
+    ids = set()
+    for item in resp if isinstance(resp, list) else (resp,):
+        if isinstance(item, dict):
+            for kind, data in item.items():
+                if isinstance(data, dict):
+                    t_id = data.get('id') if kind == 'tournament' else data.get('tournament_id')
+                    if t_id is not None:
+                        ids.add(t_id)
+    return ids
+
+
+@functools.lru_cache(maxsize=1024)
+def _param_key(prefix, field) -> str:
+    return '{}[{}]'.format(prefix, field) if prefix else field
+
+
+def _encode_value(value):
+    value_type = type(value)
+    if value_type is str:
+        return value
+    if value_type is int or value_type is float:
+        return str(value)
+    if isinstance(value, bool):
+        # challonge only accepts lowercase true/false
+        return 'true' if value else 'false'
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        # files are kept as bytes, they will be sent in a multipart body
+        return bytes(value)
+    return str(value)
+
+
+def _multipart(params: list):
+    """ split the files out of `params`, they go in a multipart body when there are some """
+    if not any(type(v) is bytes for _, v in params):
+        return params, None
+    import aiohttp
+    data = aiohttp.FormData()
+    query = []
+    for k, v in params:
+        if type(v) is bytes:
+            # `match_attachment[asset]` is uploaded as a file named `asset`
+            data.add_field(k, v, filename=k.rpartition('[')[2].rstrip(']'), content_type='application/octet-stream')
         else:
-            new_params = [(k, val(v)) for k, v in params.items()]
-        return new_params
+            query.append((k, v))
+    return query, data
 
 
-def get_connection(username, api_key, timeout=DEFAULT_TIMEOUT, loop=None):
-    return Connection(username, api_key, timeout, loop)
+def get_connection(username, api_key, timeout=DEFAULT_TIMEOUT, loop=None, keep_alive=False, pool_limit=100, circuit_breaker=None,
+                   cache=None):
+    return Connection(username, api_key, timeout, loop, keep_alive, pool_limit, circuit_breaker, cache)
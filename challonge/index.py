@@ -0,0 +1,534 @@
+import bisect
+import collections
+import datetime
+import difflib
+import heapq
+import re
+import unicodedata
+
+from .enums import MatchState
+
+
+_TIMESTAMP = re.compile(r'(\d{4})-(\d\d)-(\d\d)(?:[T ](\d\d):(\d\d)(?::(\d\d)(?:\.(\d+))?)?(Z|[+-]\d\d:?\d\d)?)?$')
+
+
+def _parse_timestamp(value: str):
+    """ an aware datetime from an ISO 8601 timestamp such as ``2030-01-02T10:00:00.000-05:00`` or a date
+    such as ``2030-01-02`` (at midnight UTC), None if it is neither """
+    match = _TIMESTAMP.match(value)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction, offset = match.groups()
+    tz = datetime.timezone.utc
+    if offset not in (None, 'Z'):
+        minutes = int(offset[1:3]) * 60 + int(offset[-2:])
+        tz = datetime.timezone(datetime.timedelta(minutes=-minutes if offset[0] == '-' else minutes))
+    try:
+        return datetime.datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0),
+                                 int((fraction or '0')[:6].ljust(6, '0')), tz)
+    except ValueError:
+        # e.g. a 13th month
+        return None
+
+
+def _is_date(value) -> bool:
+    """ whether `value` is a day without a time, as a date or an ISO 8601 string """
+    if isinstance(value, str):
+        match = _TIMESTAMP.match(value)
+        return match is not None and match.group(4) is None
+    return isinstance(value, datetime.date) and not isinstance(value, datetime.datetime)
+
+
+def _sort_key(value):
+    # timestamps are compared in UTC whatever their offset, naive ones being taken as UTC
+    if isinstance(value, str):
+        timestamp = _parse_timestamp(value)
+        if timestamp is None:
+            return value
+        value = timestamp
+    elif isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        value = datetime.datetime(value.year, value.month, value.day)
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            return value.replace(tzinfo=datetime.timezone.utc)
+        return value.astimezone(datetime.timezone.utc)
+    return value
+
+
+class TournamentIndex:
+    """ Index of tournaments answering filtered and sorted queries without scanning them all
+
+    The fields in :attr:`equality_fields` are indexed by value, the ones in :attr:`range_fields` are kept sorted.
+    An indexed tournament updates the index itself every time it is refreshed.
+
+    Usually obtained with :attr:`User.tournament_index`, which holds every tournament known by the user.
+
+    Example::
+
+        big_ones = user.tournament_index.query(state='underway', subdomain='x', min_participants_count=65,
+                                               order_by='start_at')
+
+    """
+    equality_fields = ('state', 'tournament_type', 'subdomain', 'game_name')
+    range_fields = ('start_at', 'participants_count')
+    timestamp_fields = ('start_at',)
+
+    def __init__(self, tournaments=()):
+        self._tournaments = {}
+        self._values = {}
+        self._by_value = {f: {} for f in self.equality_fields}
+        self._sorted = {f: [] for f in self.range_fields}
+        for t in tournaments:
+            self.update(t)
+
+    def __len__(self):
+        return len(self._tournaments)
+
+    def __contains__(self, t):
+        return getattr(t, 'id', None) in self._tournaments
+
+    def update(self, t):
+        """ add `t` or move it to the entries of its current values """
+        values = tuple(getattr(t, f) for f in self.equality_fields) + \
+            tuple(_sort_key(getattr(t, f)) for f in self.range_fields)
+        old = self._values.get(t.id)
+        self._tournaments[t.id] = t
+        t._tournament_index = self
+        if old == values:
+            return
+        if old is not None:
+            self._unindex(t.id, old)
+        self._values[t.id] = values
+        for f, v in zip(self.equality_fields, values):
+            self._by_value[f].setdefault(v, set()).add(t.id)
+        for f, v in zip(self.range_fields, values[len(self.equality_fields):]):
+            if v is not None:
+                bisect.insort(self._sorted[f], (v, t.id))
+
+    def remove(self, t):
+        """ forget `t` """
+        old = self._values.pop(t.id, None)
+        if self._tournaments.pop(t.id, None) is not None and t._tournament_index is self:
+            t._tournament_index = None
+        if old is not None:
+            self._unindex(t.id, old)
+
+    def _unindex(self, t_id, values):
+        for f, v in zip(self.equality_fields, values):
+            ids = self._by_value[f][v]
+            ids.discard(t_id)
+            if not ids:
+                del self._by_value[f][v]
+        for f, v in zip(self.range_fields, values[len(self.equality_fields):]):
+            if v is not None:
+                entries = self._sorted[f]
+                del entries[bisect.bisect_left(entries, (v, t_id))]
+
+    def _bound(self, field, value, upper: bool):
+        """ the sort key of a ``min_`` or ``max_`` bound, a day given as `upper` bound includes the whole day """
+        key = _sort_key(value)
+        if field in self.timestamp_fields:
+            if not isinstance(key, datetime.datetime):
+                raise ValueError('Invalid bound for {}, expected an ISO 8601 timestamp, a date or a datetime: {!r}'.format(field, value))
+            if upper and _is_date(value):
+                key += datetime.timedelta(days=1, microseconds=-1)
+        elif not isinstance(key, (int, float)) or isinstance(key, bool):
+            raise ValueError('Invalid bound for {}, expected a number: {!r}'.format(field, value))
+        return key
+
+    def _range(self, field, low, high) -> list:
+        """ ids with `low` <= value <= `high` (sort keys), sorted by value """
+        entries = self._sorted[field]
+        start = 0 if low is None else bisect.bisect_left(entries, (low,))
+        end = len(entries) if high is None else bisect.bisect_right(entries, (high, float('inf')))
+        return [t_id for _, t_id in entries[start:end]]
+
+    def values(self, field: str) -> list:
+        """ the distinct values of an equality field, e.g. every known subdomain """
+        return list(self._by_value[field])
+
+    def query(self, order_by: str = None, reverse: bool = False, limit: int = None, **conditions) -> list:
+        """ tournaments matching all the conditions
+
+        Conditions on :attr:`equality_fields` take a value or a list/set/tuple of accepted values,
+        e.g. ``state=['pending', 'underway']``. Conditions on :attr:`range_fields` are bounds prefixed
+        with ``min_`` or ``max_`` (both included), e.g. ``min_participants_count=65`` or ``max_start_at=date``.
+        Timestamps, given as ISO 8601 strings, dates or datetimes, are compared in UTC (naive ones are taken as UTC),
+        a day given as ``max_`` bound includes the whole day.
+        Tournaments without a value for a bounded or sorting range field are left out.
+
+        Args:
+            order_by: *optional* field to sort on, a range field is the fastest
+            reverse (default=False): sort in decreasing order
+            limit: *optional* maximum number of tournaments returned
+            conditions: as described
+
+        Returns:
+            list[Tournament]:
+
+        Raises:
+            ValueError: unknown condition or invalid bound
+
+        """
+        bounds = {}
+        for name, value in conditions.items():
+            if name not in self._by_value:
+                if name[:4] not in ('min_', 'max_') or name[4:] not in self._sorted:
+                    raise ValueError('Unknown condition: {}'.format(name))
+                if value is not None:
+                    bounds[name] = self._bound(name[4:], value, name[:4] == 'max_')
+
+        candidates = None
+        for name, value in conditions.items():
+            if name not in self._by_value:
+                continue
+            index = self._by_value[name]
+            if isinstance(value, (list, tuple, set, frozenset)):
+                ids = set()
+                for v in value:
+                    ids |= index.get(v, set())
+            else:
+                ids = index.get(value, set())
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return []
+
+        ordered = None
+        for field in self.range_fields:
+            low, high = bounds.get('min_' + field), bounds.get('max_' + field)
+            if low is None and high is None and field != order_by:
+                continue
+            ids = self._range(field, low, high)
+            if field == order_by:
+                ordered = ids[::-1] if reverse else ids
+            if low is not None or high is not None:
+                candidates = set(ids) if candidates is None else candidates.intersection(ids)
+
+        if ordered is not None:
+            result = ordered if candidates is None else [t_id for t_id in ordered if t_id in candidates]
+        elif candidates is None:
+            result = list(self._tournaments)
+        else:
+            result = list(candidates)
+
+        tournaments = [self._tournaments[t_id] for t_id in result]
+        if order_by is not None and ordered is None:
+            tournaments.sort(key=lambda t: (getattr(t, order_by) is None, _sort_key(getattr(t, order_by))), reverse=reverse)
+        return tournaments[:limit] if limit is not None else tournaments
+
+
+def normalize_name(name: str) -> str:
+    """ `name` case-folded, without accents and with single spaces, as compared by :class:`ParticipantNameIndex` """
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+def _trigrams(key: str) -> set:
+    padded = '  {} '.format(key)
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ParticipantNameIndex:
+    """ Index of the names of participants, for exact, prefix and fuzzy searches
+
+    A participant is found by its :attr:`name_fields`, normalized with :func:`normalize_name`,
+    so ``"jose"`` finds ``"José"``. An indexed participant updates the index itself every time it is refreshed.
+
+    Usually obtained with :attr:`Tournament.participant_index`.
+
+    """
+    name_fields = ('name', 'display_name', 'challonge_username', 'username')
+
+    def __init__(self, participants=()):
+        self._participants = {}
+        self._keys_of = {}
+        self._ids_of = {}
+        self._sorted_keys = []
+        self._trigrams = {}
+        for p in participants:
+            self.update(p)
+
+    def __len__(self):
+        return len(self._participants)
+
+    def __contains__(self, p):
+        return getattr(p, 'id', None) in self._participants
+
+    def update(self, p):
+        """ add `p` or move it to the entries of its current names """
+        keys = set()
+        for f in self.name_fields:
+            value = getattr(p, f, None)
+            if value:
+                key = normalize_name(str(value))
+                if key:
+                    keys.add(key)
+        keys = frozenset(keys)
+        self._participants[p.id] = p
+        old = self._keys_of.get(p.id)
+        if old == keys:
+            return
+        if old is not None:
+            self._unindex(p.id, old - keys)
+        self._keys_of[p.id] = keys
+        for key in keys - (old or frozenset()):
+            ids = self._ids_of.get(key)
+            if ids is None:
+                ids = self._ids_of[key] = set()
+                bisect.insort(self._sorted_keys, key)
+                for gram in _trigrams(key):
+                    self._trigrams.setdefault(gram, set()).add(key)
+            ids.add(p.id)
+
+    def remove(self, p):
+        """ forget `p` """
+        self._participants.pop(p.id, None)
+        old = self._keys_of.pop(p.id, None)
+        if old is not None:
+            self._unindex(p.id, old)
+
+    def _unindex(self, p_id, keys):
+        for key in keys:
+            ids = self._ids_of[key]
+            ids.discard(p_id)
+            if not ids:
+                del self._ids_of[key]
+                del self._sorted_keys[bisect.bisect_left(self._sorted_keys, key)]
+                for gram in _trigrams(key):
+                    keys_with_gram = self._trigrams[gram]
+                    keys_with_gram.discard(key)
+                    if not keys_with_gram:
+                        del self._trigrams[gram]
+
+    def _ranked(self, text: str, prefix: bool, fuzzy: bool, cutoff: float) -> dict:
+        """ participant id -> rank of its best match, the smallest rank being the best """
+        query = normalize_name(text)
+        ranks = {}
+
+        def add(key, rank):
+            for p_id in self._ids_of[key]:
+                if p_id not in ranks or rank < ranks[p_id]:
+                    ranks[p_id] = rank
+
+        if not query:
+            return ranks
+        if query in self._ids_of:
+            add(query, (0, 0.0))
+        if prefix:
+            keys = self._sorted_keys
+            # by position: neither a copy of the tail of the keys nor a walk from the first one
+            for i in range(bisect.bisect_left(keys, query), len(keys)):
+                key = keys[i]
+                if not key.startswith(query):
+                    break
+                if key != query:
+                    add(key, (1, float(len(key))))
+        if fuzzy:
+            # only the names sharing a trigram with the query are compared
+            shared = collections.Counter()
+            for gram in _trigrams(query):
+                shared.update(self._trigrams.get(gram, ()))
+            matcher = difflib.SequenceMatcher(None, '', query)
+            for key in shared:
+                matcher.set_seq1(key)
+                if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff:
+                    ratio = matcher.ratio()
+                    if ratio >= cutoff:
+                        add(key, (2, -ratio))
+        return ranks
+
+    def find(self, name: str) -> list:
+        """ participants having `name` as one of their normalized names """
+        return [self._participants[p_id] for p_id in self._ids_of.get(normalize_name(name), ())]
+
+    def search(self, text: str, limit: int = 10, prefix: bool = True, fuzzy: bool = True, cutoff: float = 0.6) -> list:
+        """ participants whose names match `text`, best matches first
+
+        Exact matches come first, then names starting with `text` (shortest first),
+        then names similar to `text` (most similar first).
+
+        Args:
+            text: the searched name
+            limit: maximum number of participants returned
+            prefix (default=True): include the names starting with `text`
+            fuzzy (default=True): include the names similar to `text`
+            cutoff: minimum similarity of a fuzzy match, between 0 and 1
+
+        Returns:
+            list[Participant]:
+
+        """
+        return search_participants((self,), text, limit, prefix, fuzzy, cutoff)
+
+
+def search_participants(indexes, text: str, limit: int = 10, prefix: bool = True, fuzzy: bool = True,
+                        cutoff: float = 0.6) -> list:
+    """ :func:`ParticipantNameIndex.search` over several indexes, e.g. one per tournament """
+    ranked = []
+    for index in indexes:
+        ranked.extend((rank, p_id, index) for p_id, rank in index._ranked(text, prefix, fuzzy, cutoff).items())
+    return [index._participants[p_id] for _, p_id, index in heapq.nsmallest(limit, ranked, key=lambda r: r[:2])]
+
+
+class MatchIndex:
+    """ Matches of a tournament grouped by round, group and state, and the participants of each group
+
+    Rounds are the ones of the API: negative for the losers bracket of a double elimination.
+    A participant of a group stage plays its group matches under one of its `group_player_ids`,
+    those ids are mapped back to the participant.
+    Indexed matches and participants update the index themselves every time they are refreshed.
+
+    Usually obtained with :attr:`Tournament.match_index`.
+
+    Example::
+
+        index = tournament.match_index
+        for r in index.rounds():
+            draw(r, index.matches(round=r))
+
+    """
+    fields = ('round', 'group_id', 'state')
+
+    def __init__(self, matches=(), participants=()):
+        self._matches = collections.OrderedDict()
+        self._values = {}
+        self._by_value = {f: {} for f in self.fields}
+        self._participants = {}
+        self._player_ids = {}
+        self._owner = {}
+        self._group_players = {}
+        for p in participants:
+            self.update_participant(p)
+        for m in matches:
+            self.update(m)
+
+    def __len__(self):
+        return len(self._matches)
+
+    def update(self, m):
+        """ add `m` or move it to the entries of its current round, group and state """
+        new = (tuple(getattr(m, f) for f in self.fields), (m.player1_id, m.player2_id))
+        self._matches[m.id] = m
+        old = self._values.get(m.id)
+        if old == new:
+            return
+        if old is not None:
+            self._unindex(m.id, old)
+        self._values[m.id] = new
+        values, players = new
+        for f, v in zip(self.fields, values):
+            # ordered dicts keep the insertion order and remove in O(1)
+            self._by_value[f].setdefault(v, collections.OrderedDict())[m.id] = m
+        group_id = values[1]
+        if group_id is not None:
+            counts = self._group_players.setdefault(group_id, collections.Counter())
+            counts.update(p_id for p_id in players if p_id is not None)
+
+    def remove(self, m):
+        """ forget `m` """
+        self._matches.pop(m.id, None)
+        old = self._values.pop(m.id, None)
+        if old is not None:
+            self._unindex(m.id, old)
+
+    def _unindex(self, m_id, old):
+        values, players = old
+        for f, v in zip(self.fields, values):
+            matches = self._by_value[f][v]
+            del matches[m_id]
+            if not matches:
+                del self._by_value[f][v]
+        group_id = values[1]
+        if group_id is not None:
+            counts = self._group_players[group_id]
+            counts.subtract(p_id for p_id in players if p_id is not None)
+            for p_id in [p_id for p_id in players if p_id is not None and counts[p_id] <= 0]:
+                del counts[p_id]
+            if not counts:
+                del self._group_players[group_id]
+
+    def update_participant(self, p):
+        """ add `p` or update the mapping of its `group_player_ids` """
+        self._participants[p.id] = p
+        ids = tuple(p.group_player_ids or ())
+        old = self._player_ids.get(p.id, ())
+        if old == ids:
+            return
+        for player_id in old:
+            if self._owner.get(player_id) == p.id:
+                del self._owner[player_id]
+        self._player_ids[p.id] = ids
+        for player_id in ids:
+            self._owner[player_id] = p.id
+
+    def remove_participant(self, p):
+        """ forget `p` """
+        self._participants.pop(p.id, None)
+        for player_id in self._player_ids.pop(p.id, ()):
+            if self._owner.get(player_id) == p.id:
+                del self._owner[player_id]
+
+    def find_participant(self, player_id: int):
+        """ the participant with this id or this group player id, None if unknown """
+        p = self._participants.get(player_id)
+        if p is None and player_id in self._owner:
+            p = self._participants.get(self._owner[player_id])
+        return p
+
+    def rounds(self, **conditions) -> list:
+        """ the rounds having matches satisfying the `conditions` of :func:`matches`, in increasing order
+
+        The rounds of the losers bracket, being negative, come first.
+
+        """
+        if not conditions:
+            return sorted(self._by_value['round'])
+        return sorted({m.round for m in self.matches(**conditions)})
+
+    def groups(self) -> list:
+        """ the ids of the groups having matches, in increasing order """
+        return sorted(g for g in self._by_value['group_id'] if g is not None)
+
+    def matches(self, **conditions) -> list:
+        """ the matches of a round, of a group and/or in a state, in the order they entered that round, group or state
+
+        Conditions are ``round``, ``group_id`` (None selecting the matches outside of any group)
+        and ``state`` (a string or a :class:`MatchState`), e.g. ``matches(round=-2, state='open')``.
+        The cost is proportional to the number of matches of the smallest selected entry.
+
+        Returns:
+            list[Match]:
+
+        Raises:
+            ValueError: unknown condition
+
+        """
+        entries = []
+        for name, value in conditions.items():
+            if name not in self._by_value:
+                raise ValueError('Unknown condition: {}'.format(name))
+            if isinstance(value, MatchState):
+                if value == MatchState.all_:
+                    continue
+                value = value.value
+            entries.append(self._by_value[name].get(value, {}))
+        if not entries:
+            return list(self._matches.values())
+        entries.sort(key=len)
+        smallest, others = entries[0], entries[1:]
+        return [m for m_id, m in smallest.items() if all(m_id in e for e in others)]
+
+    def group_participants(self, group_id: int) -> list:
+        """ the participants playing matches of a group, by seed """
+        result = {}
+        for player_id in self._group_players.get(group_id, ()):
+            p = self.find_participant(player_id)
+            if p is not None:
+                result[p.id] = p
+        return sorted(result.values(), key=lambda p: (p.seed is None, p.seed or 0, p.id))
+
+    def participant_groups(self, p) -> list:
+        """ the ids of the groups in which `p` plays matches """
+        ids = (p.id,) + tuple(p.group_player_ids or ())
+        return sorted(g for g, players in self._group_players.items() if any(i in players for i in ids))
@@ -1,6 +1,6 @@
 import re
 
-from .helpers import FieldHolder, assert_or_raise
+from .helpers import FieldHolder, HolderList, assert_or_raise
 from .participant import Participant
 from .attachment import Attachment
 
@@ -28,6 +28,7 @@ class Match(metaclass=FieldHolder):
         self._tournament = tournament
 
         self.attachments = None
+        self._vote_accumulator = None
         self._create_attachment = lambda a, **kwargs: self._create_holder(Attachment, a, **kwargs)
 
         self._refresh_from_json(json_def)
@@ -36,24 +37,29 @@ class Match(metaclass=FieldHolder):
         if 'match' in json_def:
             m_data = json_def['match']
             self._get_from_dict(m_data)
+            table = getattr(self._tournament, '_match_table', None)
+            if table is not None:
+                table.update((self,))
+            index = getattr(self._tournament, '_match_index', None)
+            if index is not None:
+                index.update(self)
 
             if 'attachments' in m_data:
                 if self.attachments is None:
-                    self.attachments = [self._create_attachment(a) for a in m_data['attachments']]
+                    self.attachments = HolderList(self._create_attachment(a) for a in m_data['attachments'])
                 else:
                     for a_data in m_data['attachments']:
-                        for a in self.attachments:
-                            if a_data['attachment']['id'] == a._id:
-                                a._refresh_from_json(a_data)
-                                break
+                        a = self.attachments.find(a_data['attachment']['id'])
+                        if a is not None:
+                            a._refresh_from_json(a_data)
                         else:
                             self.attachments.append(self._create_attachment(a_data))
 
     def _add_attachment(self, a: Attachment):
         if a is not None:
             if self.attachments is None:
-                self.attachments = [a]
-            else:
+                self.attachments = HolderList([a])
+            elif a not in self.attachments:
                 self.attachments.append(a)
 
     async def _report(self, scores_csv, winner=None):
@@ -175,7 +181,7 @@ class Match(metaclass=FieldHolder):
 
         if add:
             # order a fresh update of this match
-            res = await self.connection('GET', 'tournaments/{}/matches/{}'.format(self._tournament_id, self._id))
+            res = await self.connection('GET', 'tournaments/{}/matches/{}'.format(self._tournament_id, self._id), use_cache=False)
             self._refresh_from_json(res)
             if player1_votes is not None:
                 player1_votes += self._player1_votes or 0
@@ -193,6 +199,31 @@ class Match(metaclass=FieldHolder):
                                     **params)
         self._refresh_from_json(res)
 
+    def vote_accumulator(self, interval: float = 1.0, max_retries: int = 3, metrics=None):
+        """ get the vote accumulator of this match, created on first use
+
+        Increments given to :func:`VoteAccumulator.add` are sent with at most one request per `interval`
+        instead of one :func:`change_votes` call each::
+
+            async with match.vote_accumulator(interval=2) as votes:
+                for vote in incoming_votes:
+                    votes.add(player1=1)
+
+        Args:
+            interval: seconds between two flushes, only used when the accumulator is created
+            max_retries: retries of a failed flush, only used when the accumulator is created
+            metrics: *optional* :class:`Metrics` receiving the votes-per-request figures, only used when the accumulator is created
+
+        Returns:
+            VoteAccumulator: the same instance for every call on this match
+
+        """
+        if self._vote_accumulator is None:
+            # asyncio is only needed here, keep it out of the import of the models
+            from .votes import VoteAccumulator
+            self._vote_accumulator = VoteAccumulator(self, interval, max_retries, metrics)
+        return self._vote_accumulator
+
     async def _attach(self, asset=None, url: str = None, description: str = None):
         params = Attachment.prepare_params(asset, url, description)
         res = await self.connection('POST',
@@ -224,7 +255,7 @@ class Match(metaclass=FieldHolder):
 
         """
         with open(file_path, 'rb') as f:
-            return await self._attach(f.read(), description)
+            return await self._attach(f.read(), description=description)
 
     async def attach_url(self, url: str, description: str = None) -> Attachment:
         """ add an url as an attachment
@@ -276,5 +307,5 @@ class Match(metaclass=FieldHolder):
 
         """
         await self.connection('DELETE', 'tournaments/{}/matches/{}/attachments/{}'.format(self._tournament_id, self._id, a._id))
-        if a in self.attachments:
+        if self.attachments is not None and a in self.attachments:
             self.attachments.remove(a)
@@ -0,0 +1,246 @@
+import bisect
+
+from .helpers import CircuitBreaker, Connection, RequestEvent
+
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_CIRCUIT_STATES = (CircuitBreaker.CLOSED, CircuitBreaker.HALF_OPEN, CircuitBreaker.OPEN)
+
+
+class _EndpointStats:
+    __slots__ = ['requests', 'errors', 'statuses', 'buckets', 'latency_sum', 'bytes_in', 'bytes_out', 'decode_time']
+
+    def __init__(self, buckets_count):
+        self.requests = 0
+        self.errors = 0
+        self.statuses = {}
+        self.buckets = [0] * (buckets_count + 1)  # last one is +Inf
+        self.latency_sum = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.decode_time = 0.0
+
+
+class Metrics:
+    """ Collects per-endpoint metrics from the hooks of one or more :class:`Connection`
+
+    Endpoints are the API uris with their ids replaced by ``{id}``, e.g. ``tournaments/{id}/matches``.
+    Connection-level phases (see :class:`RequestEvent`) are aggregated for all endpoints together:
+    a growing ``pool_wait`` points at pool exhaustion, a growing ``ttfb`` at the remote side.
+    The state of the :class:`CircuitBreaker` of the attached connections is reported as well,
+    requests it rejected are counted as errors of their endpoint.
+
+    Example::
+
+        metrics = Metrics()
+        metrics.attach(user.connection)
+        await user.get_tournaments()
+        print(metrics.to_prometheus())
+
+    Args:
+        buckets: upper bounds (in seconds) of the latency histogram buckets
+
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.in_flight = 0
+        self._connections = []
+        self._stats = {}
+        self._phases = {}
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.votes_sent = 0
+        self.vote_requests = 0
+
+    def attach(self, connection: Connection):
+        """ start collecting the requests made through `connection` """
+        connection.on_request_start.append(self._on_start)
+        connection.on_request_end.append(self._on_end)
+        connection.on_request_error.append(self._on_error)
+        self._connections.append(connection)
+
+    def detach(self, connection: Connection):
+        """ stop collecting the requests made through `connection` """
+        connection.on_request_start.remove(self._on_start)
+        connection.on_request_end.remove(self._on_end)
+        connection.on_request_error.remove(self._on_error)
+        self._connections.remove(connection)
+
+    def reset(self):
+        self._stats = {}
+        self._phases = {}
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.votes_sent = 0
+        self.vote_requests = 0
+
+    def record_votes(self, votes: int):
+        """ count a request of a :class:`VoteAccumulator` that sent `votes` votes """
+        self.votes_sent += votes
+        self.vote_requests += 1
+
+    @property
+    def votes_per_request(self) -> float:
+        """ average number of votes sent per request by the :class:`VoteAccumulator` reporting here """
+        return self.votes_sent / self.vote_requests if self.vote_requests else 0.0
+
+    def _on_start(self, event: RequestEvent):
+        self.in_flight += 1
+
+    def _record(self, event: RequestEvent, failed: bool):
+        self.in_flight -= 1
+        key = (event.method, event.endpoint)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = _EndpointStats(len(self.buckets))
+        stats.requests += 1
+        status = str(event.status) if event.status is not None else 'error'
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        if failed or event.status is None or event.status >= 400:
+            stats.errors += 1
+        stats.buckets[bisect.bisect_left(self.buckets, event.elapsed)] += 1
+        stats.latency_sum += event.elapsed
+        stats.bytes_in += event.bytes_in
+        stats.bytes_out += event.bytes_out
+        stats.decode_time += event.decode_time
+
+        for phase, duration in event.phases.items():
+            phase_stats = self._phases.get(phase)
+            if phase_stats is None:
+                phase_stats = self._phases[phase] = [[0] * (len(self.buckets) + 1), 0.0]
+            phase_stats[0][bisect.bisect_left(self.buckets, duration)] += 1
+            phase_stats[1] += duration
+        if event.connection_reused:
+            self.connections_reused += 1
+        elif 'connect' in event.phases:
+            self.connections_created += 1
+
+    def _on_end(self, event: RequestEvent):
+        self._record(event, False)
+
+    def _on_error(self, event: RequestEvent):
+        self._record(event, True)
+
+    @property
+    def total_requests(self) -> int:
+        return sum(s.requests for s in self._stats.values())
+
+    def _cumulative(self, counts):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            yield ('+Inf' if bound == float('inf') else repr(bound)), cumulative
+
+    def _circuit_breakers(self):
+        for connection in self._connections:
+            if connection.circuit_breaker is not None:
+                yield connection.username, connection.circuit_breaker
+
+    def as_dict(self) -> dict:
+        """ all metrics as plain python types
+
+        Returns:
+            dict: ``{'in_flight': int, 'endpoints': {'METHOD endpoint': {...}}, 'phases': {phase: {...}},
+            'connections': {...}, 'circuit_breakers': {username: {...}}, 'votes': {...}}``
+
+        """
+        endpoints = {}
+        for (method, endpoint), s in sorted(self._stats.items()):
+            endpoints['{} {}'.format(method, endpoint)] = {
+                'method': method,
+                'endpoint': endpoint,
+                'requests': s.requests,
+                'errors': s.errors,
+                'statuses': dict(s.statuses),
+                'latency_sum': s.latency_sum,
+                'latency_avg': s.latency_sum / s.requests,
+                'latency_histogram': dict(self._cumulative(s.buckets)),
+                'bytes_in': s.bytes_in,
+                'bytes_out': s.bytes_out,
+                'decode_time': s.decode_time,
+            }
+        phases = {}
+        for phase, (counts, total) in sorted(self._phases.items()):
+            phases[phase] = {'count': sum(counts), 'sum': total, 'histogram': dict(self._cumulative(counts))}
+        return {
+            'in_flight': self.in_flight,
+            'endpoints': endpoints,
+            'phases': phases,
+            'connections': {'created': self.connections_created, 'reused': self.connections_reused},
+            'circuit_breakers': {username: {'state': b.state, 'failures': b.failures,
+                                            'opened': b.opened_count, 'rejected': b.rejected_count}
+                                 for username, b in self._circuit_breakers()},
+            'votes': {'sent': self.votes_sent, 'requests': self.vote_requests, 'per_request': self.votes_per_request},
+        }
+
+    def to_prometheus(self, prefix: str = 'challonge') -> str:
+        """ all metrics in the Prometheus text exposition format """
+        lines = []
+
+        def header(name, kind, doc):
+            lines.append('# HELP {}_{} {}'.format(prefix, name, doc))
+            lines.append('# TYPE {}_{} {}'.format(prefix, name, kind))
+
+        def labels(method, endpoint, **extra):
+            values = [('method', method), ('endpoint', endpoint)] + sorted(extra.items())
+            return '{' + ','.join('{}="{}"'.format(k, v) for k, v in values) + '}'
+
+        stats = sorted(self._stats.items())
+
+        header('requests_total', 'counter', 'Requests sent to the Challonge API')
+        for (method, endpoint), s in stats:
+            for status, count in sorted(s.statuses.items()):
+                lines.append('{}_requests_total{} {}'.format(prefix, labels(method, endpoint, status=status), count))
+
+        header('request_errors_total', 'counter', 'Requests that raised or got an error status')
+        for (method, endpoint), s in stats:
+            lines.append('{}_request_errors_total{} {}'.format(prefix, labels(method, endpoint), s.errors))
+
+        header('request_duration_seconds', 'histogram', 'Time spent in requests, response decoding included')
+        for (method, endpoint), s in stats:
+            for le, cumulative in self._cumulative(s.buckets):
+                lines.append('{}_request_duration_seconds_bucket{} {}'.format(prefix, labels(method, endpoint, le=le), cumulative))
+            lines.append('{}_request_duration_seconds_sum{} {!r}'.format(prefix, labels(method, endpoint), s.latency_sum))
+            lines.append('{}_request_duration_seconds_count{} {}'.format(prefix, labels(method, endpoint), s.requests))
+
+        for name, attr, doc in (('request_bytes_total', 'bytes_out', 'Bytes of encoded parameters sent'),
+                                ('response_bytes_total', 'bytes_in', 'Bytes of response bodies received'),
+                                ('decode_seconds_total', 'decode_time', 'Time spent decoding JSON responses')):
+            header(name, 'counter', doc)
+            for (method, endpoint), s in stats:
+                lines.append('{}_{}{} {!r}'.format(prefix, name, labels(method, endpoint), getattr(s, attr)))
+
+        header('request_phase_seconds', 'histogram', 'Time spent in each connection-level phase of the requests')
+        for phase, (counts, total) in sorted(self._phases.items()):
+            for le, cumulative in self._cumulative(counts):
+                lines.append('{}_request_phase_seconds_bucket{{phase="{}",le="{}"}} {}'.format(prefix, phase, le, cumulative))
+            lines.append('{}_request_phase_seconds_sum{{phase="{}"}} {!r}'.format(prefix, phase, total))
+            lines.append('{}_request_phase_seconds_count{{phase="{}"}} {}'.format(prefix, phase, sum(counts)))
+
+        header('connections_total', 'counter', 'Connections used by the requests')
+        lines.append('{}_connections_total{{kind="created"}} {}'.format(prefix, self.connections_created))
+        lines.append('{}_connections_total{{kind="reused"}} {}'.format(prefix, self.connections_reused))
+
+        header('requests_in_flight', 'gauge', 'Requests currently waiting for a response')
+        lines.append('{}_requests_in_flight {}'.format(prefix, self.in_flight))
+
+        header('votes_sent_total', 'counter', 'Votes sent by the vote accumulators')
+        lines.append('{}_votes_sent_total {}'.format(prefix, self.votes_sent))
+        header('vote_requests_total', 'counter', 'Requests sent by the vote accumulators')
+        lines.append('{}_vote_requests_total {}'.format(prefix, self.vote_requests))
+
+        breakers = list(self._circuit_breakers())
+        if breakers:
+            header('circuit_breaker_state', 'gauge', 'Current state of the circuit breaker')
+            for username, b in breakers:
+                state = b.state
+                for candidate in _CIRCUIT_STATES:
+                    lines.append('{}_circuit_breaker_state{{username="{}",state="{}"}} {}'.format(prefix, username, candidate, int(candidate == state)))
+            header('circuit_breaker_opened_total', 'counter', 'Times the circuit breaker opened')
+            for username, b in breakers:
+                lines.append('{}_circuit_breaker_opened_total{{username="{}"}} {}'.format(prefix, username, b.opened_count))
+            header('circuit_breaker_rejected_total', 'counter', 'Requests rejected while the circuit breaker was open')
+            for username, b in breakers:
+                lines.append('{}_circuit_breaker_rejected_total{{username="{}"}} {}'.format(prefix, username, b.rejected_count))
+        return '\n'.join(lines) + '\n'
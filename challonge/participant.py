@@ -23,6 +23,12 @@ class Participant(metaclass=FieldHolder):
     def _refresh_from_json(self, json_def):
         if 'participant' in json_def:
             self._get_from_dict(json_def['participant'])
+            index = getattr(self._tournament, '_participant_index', None)
+            if index is not None:
+                index.update(self)
+            match_index = getattr(self._tournament, '_match_index', None)
+            if match_index is not None:
+                match_index.update_participant(self)
 
     async def _change(self, **params):
         res = await self.connection('PUT',
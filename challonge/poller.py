@@ -0,0 +1,218 @@
+import asyncio
+import collections
+import multiprocessing
+import queue as queue_module
+import time
+
+from .helpers import Connection, get_connection
+
+
+#: fields compared between two polls for each kind of model
+TRACKED_FIELDS = {
+    'tournament': ('name', 'state', 'participants_count', 'progress_meter', 'started_at', 'completed_at', 'updated_at'),
+    'participant': ('name', 'seed', 'active', 'checked_in', 'final_rank', 'misc', 'group_player_ids'),
+    'match': ('state', 'round', 'player1_id', 'player2_id', 'winner_id', 'loser_id', 'scores_csv', 'underway_at', 'updated_at'),
+}
+
+#: longest wait, in seconds, before polling again a tournament whose polls keep failing
+MAX_BACKOFF = 300.0
+
+PollDiff = collections.namedtuple('PollDiff', 'tournament_id kind id changes')
+PollDiff.__doc__ = """ A change seen by a :class:`ShardedPoller`
+
+`changes` holds the new value of every tracked field that changed (all of them for a new model),
+it is None when the model has been deleted. Failed polls have the kind ``error`` and the changes
+``error`` (the exception) and ``failures`` (failed polls in a row); the tournament is then polled again
+after twice the interval, then four times... up to :data:`MAX_BACKOFF` seconds.
+"""
+
+
+def _diff(snapshot: dict, t_id: int, t_data: dict) -> list:
+    """ changes between `snapshot` and the tournament `t_data`, `snapshot` is updated """
+    diffs = []
+    seen = set()
+
+    def compare(kind, data):
+        key = (kind, data['id'])
+        seen.add(key)
+        fields = TRACKED_FIELDS[kind]
+        values = tuple(data.get(f) for f in fields)
+        old = snapshot.get(key)
+        if old != values:
+            snapshot[key] = values
+            changes = {f: v for f, v, o in zip(fields, values, old or (object(),) * len(fields)) if v != o}
+            diffs.append((t_id, kind, data['id'], changes))
+
+    compare('tournament', t_data)
+    for p in t_data.get('participants') or ():
+        compare('participant', p['participant'])
+    for m in t_data.get('matches') or ():
+        compare('match', m['match'])
+    for key in [k for k in snapshot if k not in seen]:
+        del snapshot[key]
+        diffs.append((t_id, key[0], key[1], None))
+    return diffs
+
+
+async def _poll_shard(username, api_key, api_url, ids, interval, spacing, queue, stop):
+    if api_url is not None:
+        Connection.challonge_api_url = api_url
+    loop = asyncio.get_event_loop()
+    connection = get_connection(username, api_key, keep_alive=True)
+    snapshots = {}
+    failures = {}
+    retry_at = {}
+    try:
+        while not stop.is_set():
+            round_start = loop.time()
+            for t_id in ids:
+                if stop.is_set():
+                    break
+                started = loop.time()
+                if retry_at.get(t_id, started) > started:
+                    continue
+                try:
+                    res = await connection('GET', 'tournaments/{}'.format(t_id), include_participants=1, include_matches=1)
+                    diffs = _diff(snapshots.setdefault(t_id, {}), t_id, res['tournament'])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # whatever the error, the other tournaments of the shard keep being polled
+                    failures[t_id] = failures.get(t_id, 0) + 1
+                    retry_at[t_id] = started + min(interval * 2 ** failures[t_id], MAX_BACKOFF)
+                    queue.put([(t_id, 'error', t_id, {'error': repr(e), 'failures': failures[t_id]})])
+                else:
+                    failures.pop(t_id, None)
+                    retry_at.pop(t_id, None)
+                    if diffs:
+                        queue.put(diffs)
+                await asyncio.sleep(max(0.0, spacing - (loop.time() - started)))
+            # sleep until the next round, checking for a stop from time to time
+            while not stop.is_set():
+                remaining = interval - (loop.time() - round_start)
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(remaining, 0.1))
+    finally:
+        await connection.close()
+
+
+def _worker(username, api_key, api_url, ids, interval, spacing, queue, stop):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(_poll_shard(username, api_key, api_url, ids, interval, spacing, queue, stop))
+    finally:
+        loop.close()
+
+
+class ShardedPoller:
+    """ Polls many tournaments from several worker processes and reports what changed
+
+    The tournament ids are split between `processes` workers. Each one has its own kept-alive connection,
+    fetches its tournaments (with participants and matches, one request each) every `interval` seconds
+    and sends the :class:`PollDiff` of each poll to this process through a multiprocessing queue.
+    A worker sends at most ``requests_per_second / processes`` requests per second.
+
+    The first poll of a tournament reports all its models as new.
+
+    Example::
+
+        with ShardedPoller(username, api_key, tournament_ids, processes=8, requests_per_second=40) as poller:
+            for diff in poller:
+                ...
+
+    Args:
+        username: name of the Challonge account
+        api_key: its API key
+        tournament_ids: ids of the tournaments to poll
+        processes: *optional* number of worker processes, the number of CPUs by default
+        interval: seconds between two polls of the same tournament
+        requests_per_second: *optional* request budget of all the workers together
+        api_url: *optional* :attr:`Connection.challonge_api_url` of the workers, the current one by default
+
+    """
+
+    def __init__(self, username: str, api_key: str, tournament_ids, processes: int = None, interval: float = 30.0,
+                 requests_per_second: float = None, api_url: str = None):
+        self.username = username
+        self.api_key = api_key
+        self.tournament_ids = list(tournament_ids)
+        self.processes = max(1, min(processes or multiprocessing.cpu_count(), len(self.tournament_ids) or 1))
+        self.interval = interval
+        self.requests_per_second = requests_per_second
+        self.api_url = api_url if api_url is not None else Connection.challonge_api_url
+
+        self._queue = None
+        self._stop = None
+        self._workers = []
+        self._pending = collections.deque()
+
+    def start(self):
+        """ start the worker processes """
+        self._queue = multiprocessing.Queue()
+        self._stop = multiprocessing.Event()
+        spacing = self.processes / self.requests_per_second if self.requests_per_second else 0.0
+        for i in range(self.processes):
+            shard = self.tournament_ids[i::self.processes]
+            worker = multiprocessing.Process(target=_worker, name='challonge-poller-{}'.format(i), daemon=True,
+                                             args=(self.username, self.api_key, self.api_url, shard,
+                                                   self.interval, spacing, self._queue, self._stop))
+            worker.start()
+            self._workers.append(worker)
+        return self
+
+    def stop(self, timeout: float = 10.0):
+        """ stop the workers, the diffs they already sent can still be read with :func:`get` """
+        if self._stop is not None:
+            self._stop.set()
+        # a worker only exits once what it put in the queue has been read
+        deadline = time.monotonic() + timeout
+        while any(w.is_alive() for w in self._workers) and time.monotonic() < deadline:
+            self._drain(0.05)
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+        self._workers = []
+
+    def _drain(self, timeout: float):
+        try:
+            batch = self._queue.get(timeout=timeout)
+            while True:
+                self._pending.extend(PollDiff(*d) for d in batch)
+                batch = self._queue.get_nowait()
+        except queue_module.Empty:
+            pass
+
+    def get(self, timeout: float = None) -> PollDiff:
+        """ the next change, None if none arrived within `timeout` seconds """
+        if not self._pending:
+            try:
+                batch = self._queue.get(timeout=timeout)
+            except queue_module.Empty:
+                return None
+            self._pending.extend(PollDiff(*d) for d in batch)
+        return self._pending.popleft()
+
+    async def get_async(self, timeout: float = None) -> PollDiff:
+        """ :func:`get` without blocking the event loop
+
+        |methcoro|
+
+        """
+        if self._pending:
+            return self._pending.popleft()
+        return await asyncio.get_event_loop().run_in_executor(None, self.get, timeout)
+
+    def __iter__(self):
+        while self._workers:
+            diff = self.get(timeout=0.5)
+            if diff is not None:
+                yield diff
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,288 @@
+import json
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+_Q = math.log(10) / 400
+
+# batches with fewer games than that are not worth converting to numpy arrays
+_VECTORIZE_THRESHOLD = 64
+
+
+def default_identity(participant) -> str:
+    """ who a participant is across tournaments: its Challonge username, else its `misc` field, else its name """
+    if participant.challonge_username:
+        return 'user:' + participant.challonge_username.casefold()
+    if participant.misc:
+        return 'misc:' + participant.misc
+    return 'name:' + (participant.name or '').casefold()
+
+
+class RatingEngine:
+    """ Elo or Glicko ratings of the players of many tournaments, updated as matches get completed
+
+    Results are applied by batches: all the games of a batch are rated against the ratings the players had
+    before it, which is what a Glicko rating period is. :func:`process_tournament` makes one batch of the
+    completed matches of a tournament it has not seen yet, so it can be called after every refresh, and
+    a backlog is processed one tournament at a time with :func:`process_tournaments`.
+    Large batches are computed with numpy when it is installed.
+
+    Players are identified by `identity`, a function of a :class:`Participant` (:func:`default_identity` by default).
+
+    Args:
+        method: ``elo`` or ``glicko``
+        initial_rating: rating of a new player
+        k_factor: Elo only, maximum change of rating per game
+        initial_rd: Glicko only, rating deviation of a new player
+        rd_increase: Glicko only, deviation added before each batch a player takes part in (``c`` in Glicko)
+        identity: *optional* function giving the identity of a participant
+        vectorize: *optional* force (True) or prevent (False) the use of numpy
+
+    """
+
+    def __init__(self, method: str = 'elo', initial_rating: float = 1500.0, k_factor: float = 32.0,
+                 initial_rd: float = 350.0, rd_increase: float = 35.0, identity=None, vectorize: bool = None):
+        if method not in ('elo', 'glicko'):
+            raise ValueError('method must be `elo` or `glicko`, not `{}`'.format(method))
+        if vectorize and numpy is None:
+            raise ImportError('vectorized updates need numpy')
+        self.method = method
+        self.initial_rating = initial_rating
+        self.k_factor = k_factor
+        self.initial_rd = initial_rd
+        self.rd_increase = rd_increase
+        self.identity = identity or default_identity
+        self.vectorize = vectorize
+
+        self._index = {}
+        self._players = []
+        self._ratings = []
+        self._rds = []
+        self._games = []
+        self.processed_matches = set()
+
+    def _player(self, identity: str) -> int:
+        i = self._index.get(identity)
+        if i is None:
+            i = self._index[identity] = len(self._players)
+            self._players.append(identity)
+            self._ratings.append(self.initial_rating)
+            self._rds.append(self.initial_rd)
+            self._games.append(0)
+        return i
+
+    def rating(self, identity: str) -> float:
+        """ current rating of a player, the initial rating if unknown """
+        i = self._index.get(identity)
+        return self.initial_rating if i is None else self._ratings[i]
+
+    def rd(self, identity: str) -> float:
+        """ current rating deviation of a player (Glicko) """
+        i = self._index.get(identity)
+        return self.initial_rd if i is None else self._rds[i]
+
+    def leaderboard(self, count: int = None, min_games: int = 0) -> list:
+        """ players sorted by rating
+
+        Returns:
+            list[tuple]: ``(identity, rating, rd, games)``
+
+        """
+        rows = [(p, r, d, g) for p, r, d, g in zip(self._players, self._ratings, self._rds, self._games) if g >= min_games]
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows[:count] if count is not None else rows
+
+    def __len__(self):
+        return len(self._players)
+
+    # ------------------------------------------------------------------
+    # updates
+
+    def update(self, results) -> int:
+        """ apply one batch of results
+
+        Args:
+            results: iterable of ``(identity_a, identity_b, score_a)`` with `score_a` 1 for a win of `a`,
+                0 for a loss and 0.5 for a tie
+
+        Returns:
+            int: number of games applied
+
+        """
+        a, b, scores = [], [], []
+        for identity_a, identity_b, score in results:
+            a.append(self._player(identity_a))
+            b.append(self._player(identity_b))
+            scores.append(float(score))
+        if not a:
+            return 0
+
+        vectorize = self.vectorize
+        if vectorize is None:
+            vectorize = numpy is not None and len(a) >= _VECTORIZE_THRESHOLD
+        if self.method == 'elo':
+            (self._elo_numpy if vectorize else self._elo_python)(a, b, scores)
+        else:
+            (self._glicko_numpy if vectorize else self._glicko_python)(a, b, scores)
+
+        for i in a:
+            self._games[i] += 1
+        for i in b:
+            self._games[i] += 1
+        return len(a)
+
+    def _elo_python(self, a, b, scores):
+        ratings = self._ratings
+        deltas = {}
+        for i, j, s in zip(a, b, scores):
+            expected = 1 / (1 + 10 ** ((ratings[j] - ratings[i]) / 400))
+            delta = self.k_factor * (s - expected)
+            deltas[i] = deltas.get(i, 0.0) + delta
+            deltas[j] = deltas.get(j, 0.0) - delta
+        for i, delta in deltas.items():
+            ratings[i] += delta
+
+    def _elo_numpy(self, a, b, scores):
+        a, b, scores = numpy.asarray(a), numpy.asarray(b), numpy.asarray(scores)
+        ratings = numpy.asarray(self._ratings)
+        expected = 1 / (1 + 10 ** ((ratings[b] - ratings[a]) / 400))
+        delta = self.k_factor * (scores - expected)
+        deltas = numpy.zeros(len(ratings))
+        numpy.add.at(deltas, a, delta)
+        numpy.subtract.at(deltas, b, delta)
+        self._ratings = (ratings + deltas).tolist()
+
+    def _pre_period_rd(self, i):
+        # the deviation of a player grows between two rating periods, new players start at the initial one
+        if self._games[i] == 0:
+            return self.initial_rd
+        return min(math.sqrt(self._rds[i] ** 2 + self.rd_increase ** 2), self.initial_rd)
+
+    def _glicko_python(self, a, b, scores):
+        players = set(a) | set(b)
+        rds = {i: self._pre_period_rd(i) for i in players}
+        g = {i: 1 / math.sqrt(1 + 3 * _Q ** 2 * rds[i] ** 2 / math.pi ** 2) for i in players}
+        variance_sums = dict.fromkeys(players, 0.0)
+        score_sums = dict.fromkeys(players, 0.0)
+        ratings = self._ratings
+        for i, j, s in zip(a, b, scores):
+            for me, other, score in ((i, j, s), (j, i, 1 - s)):
+                expected = 1 / (1 + 10 ** (-g[other] * (ratings[me] - ratings[other]) / 400))
+                variance_sums[me] += g[other] ** 2 * expected * (1 - expected)
+                score_sums[me] += g[other] * (score - expected)
+
+        for i in players:
+            inverse_d2 = _Q ** 2 * variance_sums[i]
+            denominator = 1 / rds[i] ** 2 + inverse_d2
+            ratings[i] += _Q / denominator * score_sums[i]
+            self._rds[i] = math.sqrt(1 / denominator)
+
+    def _glicko_numpy(self, a, b, scores):
+        a, b, scores = numpy.asarray(a), numpy.asarray(b), numpy.asarray(scores)
+        players = numpy.unique(numpy.concatenate((a, b)))
+        ratings = numpy.asarray(self._ratings)
+        rds = numpy.asarray(self._rds)
+        games = numpy.asarray(self._games)
+        rds[players] = numpy.where(games[players] == 0, self.initial_rd,
+                                   numpy.minimum(numpy.sqrt(rds[players] ** 2 + self.rd_increase ** 2), self.initial_rd))
+        g = 1 / numpy.sqrt(1 + 3 * _Q ** 2 * rds ** 2 / math.pi ** 2)
+
+        variance_sums = numpy.zeros(len(ratings))
+        score_sums = numpy.zeros(len(ratings))
+        for me, other, score in ((a, b, scores), (b, a, 1 - scores)):
+            expected = 1 / (1 + 10 ** (-g[other] * (ratings[me] - ratings[other]) / 400))
+            numpy.add.at(variance_sums, me, g[other] ** 2 * expected * (1 - expected))
+            numpy.add.at(score_sums, me, g[other] * (score - expected))
+
+        denominator = 1 / rds[players] ** 2 + _Q ** 2 * variance_sums[players]
+        ratings[players] += _Q / denominator * score_sums[players]
+        rds[players] = numpy.sqrt(1 / denominator)
+        self._ratings = ratings.tolist()
+        self._rds = rds.tolist()
+
+    def results_of(self, tournament) -> list:
+        """ the completed matches of `tournament` not processed yet, as ``(identity_a, identity_b, score_a)``
+
+        The ids of those matches are marked as processed.
+
+        """
+        results = []
+        for m in tournament.matches or ():
+            if m.state != 'complete' or m.id in self.processed_matches:
+                continue
+            if m.player1_id is None or m.player2_id is None:
+                continue
+            p1 = tournament._find_participant(m.player1_id)
+            p2 = tournament._find_participant(m.player2_id)
+            if p1 is None or p2 is None:
+                continue
+            if m.winner_id is None:
+                score = 0.5
+            else:
+                score = 1.0 if m.winner_id == m.player1_id else 0.0
+            results.append((self.identity(p1), self.identity(p2), score))
+            self.processed_matches.add(m.id)
+        return results
+
+    def process_tournament(self, tournament) -> int:
+        """ apply the completed matches of `tournament` that were not processed yet, as one batch
+
+        The matches and participants of the tournament must have been fetched.
+
+        Returns:
+            int: number of games applied
+
+        """
+        return self.update(self.results_of(tournament))
+
+    def process_tournaments(self, tournaments) -> int:
+        """ :func:`process_tournament` on every tournament, sorted by completion date
+
+        Returns:
+            int: number of games applied
+
+        """
+        key = lambda t: (t.completed_at is None, str(t.completed_at or ''), t.id)
+        return sum(self.process_tournament(t) for t in sorted(tournaments, key=key))
+
+    # ------------------------------------------------------------------
+    # persistence
+
+    def to_dict(self) -> dict:
+        return {
+            'method': self.method,
+            'initial_rating': self.initial_rating,
+            'k_factor': self.k_factor,
+            'initial_rd': self.initial_rd,
+            'rd_increase': self.rd_increase,
+            'players': {p: [r, d, g] for p, r, d, g in zip(self._players, self._ratings, self._rds, self._games)},
+            'processed_matches': sorted(self.processed_matches),
+        }
+
+    def save(self, path: str):
+        """ write the ratings and the processed match ids to a JSON file """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def from_dict(cls, data: dict, **kwargs):
+        params = {k: data[k] for k in ('method', 'initial_rating', 'k_factor', 'initial_rd', 'rd_increase')}
+        params.update(kwargs)
+        engine = cls(**params)
+        for identity, (rating, rd, games) in data['players'].items():
+            i = engine._player(identity)
+            engine._ratings[i] = rating
+            engine._rds[i] = rd
+            engine._games[i] = games
+        engine.processed_matches = set(data['processed_matches'])
+        return engine
+
+    @classmethod
+    def load(cls, path: str, **kwargs):
+        """ engine saved with :func:`save`, `kwargs` are given to the constructor (e.g. `identity`) """
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f), **kwargs)
@@ -0,0 +1,292 @@
+import array
+import bisect
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+
+_TIE = -2
+
+
+def _topological_order(matches) -> list:
+    by_id = {m.id: m for m in matches}
+    order = []
+    visited = set()
+
+    def visit(m):
+        # iterative depth-first search, brackets can be deep
+        stack = [(m, False)]
+        while stack:
+            current, done = stack.pop()
+            if done:
+                order.append(current)
+                continue
+            if current.id in visited:
+                continue
+            visited.add(current.id)
+            stack.append((current, True))
+            for prereq_id in (current.player1_prereq_match_id, current.player2_prereq_match_id):
+                if prereq_id in by_id and prereq_id not in visited:
+                    stack.append((by_id[prereq_id], False))
+
+    for m in sorted(matches, key=lambda m: (m.suggested_play_order or 0, m.id)):
+        visit(m)
+    return order
+
+
+class CompiledBracket:
+    """ The match graph of a tournament as flat integer arrays, cheap to copy to other processes and to simulate
+
+    Matches are in an order where prerequisites come first. For each match and each of its two slots,
+    either a player index is fixed or the slot takes the winner (or loser) of a prerequisite match.
+    Completed matches keep their result. Placements given to the players eliminated by each match
+    follow the Challonge final ranks.
+
+    Built by :func:`compile_bracket`.
+
+    """
+
+    def __init__(self, participant_ids, ratings, round_robin: bool):
+        self.participant_ids = list(participant_ids)
+        self.ratings = array.array('d', ratings)
+        self.round_robin = round_robin
+        self.fixed = array.array('i')        # player index of each slot, -1 if none: 2 per match
+        self.source = array.array('i')       # prerequisite match index of each slot, -1 if none: 2 per match
+        self.source_loser = array.array('b')  # the slot takes the loser of its prerequisite: 2 per match
+        self.forced_winner = array.array('i')  # winner index of completed matches, -1 otherwise, -2 for a tie
+        self.forced_loser = array.array('i')
+        self.optional = array.array('b')      # bracket reset, only played if the player coming from the losers side won
+        self.loser_rank = array.array('i')    # placement of the loser when the match eliminates it, 0 otherwise
+        self.winner_rank = array.array('i')   # placement of the winner for the final and third place matches
+
+    def __len__(self):
+        return len(self.forced_winner)
+
+
+def compile_bracket(tournament, ratings: dict = None) -> CompiledBracket:
+    """ compile the current state of `tournament` for :func:`simulate`
+
+    The matches and participants of the tournament must have been fetched.
+    Round robin and swiss tournaments are ranked by points on the matches that already exist.
+
+    Args:
+        tournament: a :class:`Tournament`
+        ratings: *optional* Elo rating of each participant id, 1500 for those missing
+
+    Returns:
+        CompiledBracket:
+
+    """
+    ratings = ratings or {}
+    participants = [p for p in tournament.participants or () if p.active is not False]
+    index = {p.id: i for i, p in enumerate(participants)}
+    for i, p in enumerate(participants):
+        for group_player_id in p.group_player_ids or ():
+            index.setdefault(group_player_id, i)
+
+    matches = _topological_order(list(tournament.matches or ()))
+    round_robin = tournament.tournament_type in ('round robin', 'swiss') or \
+        not any(m.player1_prereq_match_id or m.player2_prereq_match_id for m in matches)
+    compiled = CompiledBracket([p.id for p in participants], [ratings.get(p.id, 1500.0) for p in participants], round_robin)
+
+    position = {m.id: k for k, m in enumerate(matches)}
+    next_match = {}
+    fed_losers = set()
+    for k, m in enumerate(matches):
+        for prereq_id, is_loser, player_id in ((m.player1_prereq_match_id, m.player1_is_prereq_match_loser, m.player1_id),
+                                               (m.player2_prereq_match_id, m.player2_is_prereq_match_loser, m.player2_id)):
+            if prereq_id in position and m.state != 'complete':
+                compiled.source.append(position[prereq_id])
+                compiled.source_loser.append(bool(is_loser))
+                compiled.fixed.append(-1)
+            else:
+                compiled.source.append(-1)
+                compiled.source_loser.append(False)
+                compiled.fixed.append(index.get(player_id, -1))
+            if prereq_id in position:
+                if is_loser:
+                    fed_losers.add(position[prereq_id])
+                else:
+                    next_match[position[prereq_id]] = k
+        if m.state == 'complete' and m.winner_id in index:
+            compiled.forced_winner.append(index[m.winner_id])
+            compiled.forced_loser.append(index.get(m.loser_id, -1))
+        elif m.state == 'complete' and m.winner_id is None:
+            compiled.forced_winner.append(_TIE)
+            compiled.forced_loser.append(_TIE)
+        else:
+            compiled.forced_winner.append(-1)
+            compiled.forced_loser.append(-1)
+        compiled.optional.append(bool(m.optional))
+
+    # placements, the way Challonge ranks an elimination bracket: the later a player is eliminated, the better
+    third_place = [k for k, m in enumerate(matches)
+                   if m.round == 0 and tournament.tournament_type == 'single elimination' and k not in next_match]
+
+    def distance(k):
+        d = 0
+        while k in next_match:
+            k = next_match[k]
+            d += 1
+        return d
+
+    keys = []
+    for k in range(len(matches)):
+        if k in third_place:
+            keys.append(((.5, 0), (.5, 1)))
+        elif k not in fed_losers and k not in next_match:
+            keys.append(((-1, 0), (0, 0)))  # the final
+        elif k not in fed_losers:
+            keys.append((None, (distance(k), 0)))
+        else:
+            keys.append((None, None))
+    all_keys = sorted(key for pair in keys for key in pair if key is not None)
+
+    def rank(key):
+        if key is None or compiled.round_robin:
+            return 0
+        return 1 + bisect.bisect_left(all_keys, key)
+
+    for winner_key, loser_key in keys:
+        compiled.winner_rank.append(rank(winner_key))
+        compiled.loser_rank.append(rank(loser_key))
+    return compiled
+
+
+def _win_probability(ratings, a, b) -> float:
+    return 1 / (1 + 10 ** ((ratings[b] - ratings[a]) / 400))
+
+
+def _simulate_once(c: CompiledBracket, rng: random.Random, counts: list, points: list):
+    count = len(c)
+    winners = [-1] * count
+    losers = [-1] * count
+    ratings = c.ratings
+    for k in range(count):
+        if c.forced_winner[k] == _TIE:
+            # completed tie of a round robin, half a win each
+            for s in (2 * k, 2 * k + 1):
+                if c.fixed[s] >= 0:
+                    points[c.fixed[s]] += 1
+            continue
+        if c.forced_winner[k] >= 0:
+            winner, loser = c.forced_winner[k], c.forced_loser[k]
+        else:
+            slots = []
+            for s in (2 * k, 2 * k + 1):
+                source = c.source[s]
+                if source < 0:
+                    slots.append(c.fixed[s])
+                else:
+                    slots.append(losers[source] if c.source_loser[s] else winners[source])
+            a, b = slots
+            if c.optional[k] and c.source[2 * k] >= 0 and c.source[2 * k] == c.source[2 * k + 1]:
+                # bracket reset: not played when the player coming from the winners side won the first final
+                source = c.source[2 * k]
+                first_slot = c.source[2 * source]
+                first_player = c.fixed[2 * source] if first_slot < 0 else (losers[first_slot] if c.source_loser[2 * source] else winners[first_slot])
+                if winners[source] == first_player:
+                    winners[k], losers[k] = winners[source], losers[source]
+                    _place(c, k, winners[k], losers[k], counts)
+                    continue
+            if a < 0 or b < 0:
+                winner, loser = (a if a >= 0 else b), -1
+            elif rng.random() < _win_probability(ratings, a, b):
+                winner, loser = a, b
+            else:
+                winner, loser = b, a
+        winners[k], losers[k] = winner, loser
+        if c.round_robin:
+            if winner >= 0 and loser >= 0:
+                points[winner] += 2
+        else:
+            _place(c, k, winner, loser, counts)
+
+    if c.round_robin:
+        # every placement is taken from the full totals before they are reset
+        ordered = sorted(points)
+        for i, p in enumerate(points):
+            placement = 1 + len(ordered) - bisect.bisect_right(ordered, p)
+            counts[i][placement] = counts[i].get(placement, 0) + 1
+        for i in range(len(points)):
+            points[i] = 0
+
+
+def _place(c: CompiledBracket, k: int, winner: int, loser: int, counts: list):
+    if loser >= 0 and c.loser_rank[k]:
+        counts[loser][c.loser_rank[k]] = counts[loser].get(c.loser_rank[k], 0) + 1
+    if winner >= 0 and c.winner_rank[k]:
+        counts[winner][c.winner_rank[k]] = counts[winner].get(c.winner_rank[k], 0) + 1
+
+
+def _run_chunk(compiled: CompiledBracket, simulations: int, seed) -> list:
+    rng = random.Random(seed)
+    counts = [{} for _ in compiled.participant_ids]
+    points = [0] * len(compiled.participant_ids)
+    for _ in range(simulations):
+        _simulate_once(compiled, rng, counts, points)
+    return counts
+
+
+class SimulationResult:
+    """ Placement distributions returned by :func:`simulate`
+
+    Attributes:
+        simulations: number of simulated brackets
+        placements: for each participant id, the probability of each final placement
+
+    """
+
+    def __init__(self, participant_ids, counts, simulations: int):
+        self.simulations = simulations
+        self.placements = {p_id: {rank: n / simulations for rank, n in sorted(c.items())}
+                           for p_id, c in zip(participant_ids, counts)}
+
+    def top(self, n: int) -> dict:
+        """ probability of each participant id to finish at placement `n` or better """
+        return {p_id: sum(prob for rank, prob in ranks.items() if rank <= n) for p_id, ranks in self.placements.items()}
+
+    def expected_placement(self) -> dict:
+        return {p_id: sum(rank * prob for rank, prob in ranks.items()) for p_id, ranks in self.placements.items()}
+
+
+def simulate(tournament, ratings: dict = None, simulations: int = 10000, processes: int = None, seed=None) -> SimulationResult:
+    """ Monte Carlo simulation of the rest of a tournament
+
+    Completed matches keep their result, the others are won with the probability given by the Elo
+    formula on `ratings`. Simulations are split between `processes` worker processes.
+
+    Example::
+
+        engine = RatingEngine.load('ratings.json')
+        ratings = {p.id: engine.rating(engine.identity(p)) for p in tournament.participants}
+        top8 = simulate(tournament, ratings, simulations=100000).top(8)
+
+    Args:
+        tournament: a :class:`Tournament` whose matches and participants have been fetched,
+            or a :class:`CompiledBracket`
+        ratings: *optional* Elo rating of each participant id, all players are equal by default
+        simulations: number of simulated brackets
+        processes: number of worker processes, default is the number of CPUs, 1 runs in this process
+        seed: *optional* seed for reproducible results
+
+    Returns:
+        SimulationResult:
+
+    """
+    compiled = tournament if isinstance(tournament, CompiledBracket) else compile_bracket(tournament, ratings)
+    rng = random.Random(seed)
+
+    if processes == 1:
+        counts = _run_chunk(compiled, simulations, rng.random())
+    else:
+        workers = processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = [simulations // workers + (1 if i < simulations % workers else 0) for i in range(workers)]
+            futures = [executor.submit(_run_chunk, compiled, n, rng.random()) for n in chunks if n]
+            counts = [{} for _ in compiled.participant_ids]
+            for future in futures:
+                for total, chunk in zip(counts, future.result()):
+                    for rank, n in chunk.items():
+                        total[rank] = total.get(rank, 0) + n
+    return SimulationResult(compiled.participant_ids, counts, simulations)
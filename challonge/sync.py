@@ -0,0 +1,123 @@
+import asyncio
+import functools
+import threading
+
+from .helpers import FieldHolder
+from .user import User
+
+
+class SyncProxy:
+    """ Synchronous view of a :class:`User`, :class:`Tournament`, :class:`Participant`, :class:`Match` or :class:`Attachment`
+
+    Coroutine methods become blocking calls executed in the event loop of the :class:`SyncClient`.
+    Any model returned by those calls (alone, in a list or in a dict) is wrapped as well,
+    and proxies given as arguments are unwrapped.
+
+    """
+    __slots__ = ['_obj', '_client']
+
+    def __init__(self, obj, client):
+        object.__setattr__(self, '_obj', obj)
+        object.__setattr__(self, '_client', client)
+
+    def __getattr__(self, name):
+        value = getattr(self._obj, name)
+        if asyncio.iscoroutinefunction(value):
+            client = self._client
+
+            @functools.wraps(value)
+            def method(*args, **kwargs):
+                args = [_unwrap(a) for a in args]
+                kwargs = {k: _unwrap(v) for k, v in kwargs.items()}
+                return client._wrap(client.run(value(*args, **kwargs)))
+            return method
+        return self._client._wrap(value)
+
+    def __setattr__(self, name, value):
+        setattr(self._obj, name, _unwrap(value))
+
+    def __eq__(self, other):
+        return self._obj == _unwrap(other)
+
+    def __hash__(self):
+        return hash(self._obj)
+
+    def __repr__(self):
+        return 'SyncProxy({!r})'.format(self._obj)
+
+
+def _unwrap(value):
+    return value._obj if isinstance(value, SyncProxy) else value
+
+
+class SyncClient:
+    """ Blocking client for code that cannot await, e.g. threaded WSGI applications
+
+    One event loop runs in a background thread and every call is submitted to it with
+    :func:`asyncio.run_coroutine_threadsafe`, so the client can be shared by many threads and
+    they all reuse the same pooled HTTP session (``keep_alive`` defaults to True).
+
+    Attributes and methods of the underlying :class:`User` are available directly::
+
+        client = SyncClient('username', 'api_key')
+        for t in client.get_tournaments():
+            print(t.name, len(t.get_participants()))
+        client.close()
+
+    Args:
+        username: username as specified on the challonge website
+        api_key: key as found on the challonge settings
+        call_timeout: *optional* seconds to wait for any call before raising :class:`concurrent.futures.TimeoutError`
+        kwargs: same options as :func:`get_user`
+
+    """
+
+    def __init__(self, username: str, api_key: str, call_timeout: float = None, **kwargs):
+        kwargs.setdefault('keep_alive', True)
+        self.call_timeout = call_timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='challonge-sync', daemon=True)
+        self._thread.start()
+        self._user = self.run(self._create_user(username, api_key, kwargs))
+        self.user = SyncProxy(self._user, self)
+
+    @staticmethod
+    async def _create_user(username, api_key, kwargs):
+        # created inside the loop thread, where the connection will be used
+        return User(username, api_key, **kwargs)
+
+    def run(self, coro):
+        """ run a coroutine in the client loop and wait for its result """
+        if self._loop.is_closed():
+            coro.close()
+            raise RuntimeError('SyncClient is closed')
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(self.call_timeout)
+
+    def _wrap(self, value):
+        if isinstance(type(value), FieldHolder) or isinstance(value, User):
+            return SyncProxy(value, self)
+        if isinstance(value, list):
+            return [self._wrap(v) for v in value]
+        if isinstance(value, dict):
+            return type(value)((k, self._wrap(v)) for k, v in value.items())
+        return value
+
+    def __getattr__(self, name):
+        if name == 'user':
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def close(self):
+        """ close the HTTP session and stop the background loop """
+        if self._loop.is_closed():
+            return
+        self.run(self._user.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
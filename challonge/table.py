@@ -0,0 +1,162 @@
+import array
+import operator
+
+
+#: value of the integer columns for a missing field
+NULL = -(1 << 63)
+
+_INT_COLUMNS = ('id', 'tournament_id', 'round', 'player1_id', 'player2_id',
+                'winner_id', 'loser_id', 'suggested_play_order')
+_STATES = ('pending', 'open', 'complete')
+
+
+def _int(value):
+    return NULL if value is None else int(value)
+
+
+class MatchRow:
+    """ Read-only view of one row of a :class:`MatchTable`
+
+    Columns are attributes (missing values are None, `state` is decoded) and :attr:`match` is the :class:`Match` itself.
+
+    """
+    __slots__ = ['_table', '_index']
+
+    def __init__(self, table, index: int):
+        self._table = table
+        self._index = index
+
+    def __getattr__(self, name):
+        table = self._table
+        if name == 'state':
+            return table.states[table._columns['state'][self._index]]
+        if name in table._columns:
+            value = table._columns[name][self._index]
+            return None if value == NULL else value
+        raise AttributeError(name)
+
+    @property
+    def match(self):
+        return self._table._matches[self._index]
+
+    def __repr__(self):
+        return 'MatchRow(id={}, round={}, state={})'.format(self.id, self.round, self.state)
+
+
+class MatchTable:
+    """ Columnar copy of the main fields of a list of :class:`Match`, for analytics
+
+    Each column is an :class:`array.array`: the ids and rounds are 64-bit integers with :data:`NULL` for
+    missing values, the states are small integers indexing :attr:`states`. Columns support the buffer
+    protocol, e.g. ``numpy.frombuffer(table.column('round'), dtype='int64')`` does not copy anything.
+
+    Usually obtained with :attr:`Tournament.match_table` or :attr:`User.match_table`.
+
+    Args:
+        matches: matches to put in the table
+
+    Attributes:
+        version: incremented on each change of the table
+
+    """
+    columns = _INT_COLUMNS + ('state',)
+    _int_values = operator.attrgetter(*_INT_COLUMNS)
+
+    def __init__(self, matches=()):
+        self._columns = {name: array.array('q') for name in _INT_COLUMNS}
+        self._columns['state'] = array.array('b')
+        self._int_columns = [self._columns[name] for name in _INT_COLUMNS]
+        self.version = 0
+        self.states = list(_STATES)
+        self._state_codes = {s: i for i, s in enumerate(self.states)}
+        self._rows = {}
+        self._matches = []
+        self.update(matches)
+
+    def _state_code(self, state) -> int:
+        code = self._state_codes.get(state)
+        if code is None:
+            code = self._state_codes[state] = len(self.states)
+            self.states.append(state)
+        return code
+
+    def update(self, matches):
+        """ add the new matches and overwrite the rows of the known ones """
+        self.version += 1
+        states = self._columns['state']
+        for m in matches:
+            values = self._int_values(m)
+            index = self._rows.get(m.id)
+            if index is None:
+                self._rows[m.id] = len(self._matches)
+                self._matches.append(m)
+                for column, value in zip(self._int_columns, values):
+                    column.append(_int(value))
+                states.append(self._state_code(m.state))
+            else:
+                for column, value in zip(self._int_columns, values):
+                    column[index] = _int(value)
+                states[index] = self._state_code(m.state)
+
+    def column(self, name: str) -> array.array:
+        """ the array holding the column `name`, it must not be modified """
+        return self._columns[name]
+
+    def row(self, match_id: int) -> MatchRow:
+        """ the row of the match with the id `match_id`, None if there is none """
+        index = self._rows.get(match_id)
+        return None if index is None else MatchRow(self, index)
+
+    def select(self, **conditions) -> list:
+        """ rows whose columns are equal to the given values, e.g. ``table.select(round=1, state='open')``
+
+        Returns:
+            list[MatchRow]:
+
+        """
+        indexes = range(len(self))
+        for name, value in conditions.items():
+            if name == 'state':
+                value = self._state_codes.get(value)
+            else:
+                value = _int(value)
+            column = self._columns[name]
+            indexes = [i for i in indexes if column[i] == value]
+        return [MatchRow(self, i) for i in indexes]
+
+    def to_dict(self) -> dict:
+        """ every column as a list, missing values as None and states decoded """
+        data = {name: [None if v == NULL else v for v in self._columns[name]] for name in _INT_COLUMNS}
+        data['state'] = [self.states[code] for code in self._columns['state']]
+        return data
+
+    @classmethod
+    def concat(cls, tables):
+        """ a new table holding the rows of all `tables` """
+        result = cls()
+        for table in tables:
+            offset = len(result)
+            for name in _INT_COLUMNS:
+                result._columns[name].extend(table._columns[name])
+            codes = [result._state_code(s) for s in table.states]
+            if codes == list(range(len(codes))):
+                result._columns['state'].extend(table._columns['state'])
+            else:
+                result._columns['state'].extend(codes[c] for c in table._columns['state'])
+            result._rows.update((m_id, index + offset) for m_id, index in table._rows.items())
+            result._matches.extend(table._matches)
+        return result
+
+    def __len__(self):
+        return len(self._matches)
+
+    def __getitem__(self, index: int) -> MatchRow:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('MatchTable index out of range')
+        return MatchRow(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield MatchRow(self, i)
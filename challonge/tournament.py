@@ -1,13 +1,136 @@
+import bisect
 from datetime import datetime
 from collections import OrderedDict
 
 from . import AUTO_GET_PARTICIPANTS, AUTO_GET_MATCHES
-from .helpers import FieldHolder, assert_or_raise
+from .helpers import FieldHolder, HolderList, BulkAddError, BulkResult, assert_or_raise, run_bulk, _is_success
 from .participant import Participant
 from .match import Match
+from .table import MatchTable
+from .index import ParticipantNameIndex, MatchIndex
+from .bracket import BracketRenderer
 from .enums import TournamentType, TournamentState, Pairing, DoubleEliminationEnding, RankingOrder
 
 
+class _BatchUpdate:
+    """ changes collected by :func:`Tournament.batch_update`
+
+    Its :func:`Tournament.update` and update helpers record the changes instead of sending them,
+    the other attributes are the ones of the tournament. The changes are kept here, not on the
+    tournament, so updates made by other coroutines on the tournament itself are sent right away.
+
+    """
+    # the helpers of Tournament that only call `update`
+    _helpers = {'update_tournament_type', 'update_name', 'update_url', 'update_subdomain', 'update_description',
+                'allow_attachments', 'set_start_date', 'update_double_elim_ending', 'set_single_elim_third_place_match',
+                'setup_swiss_points', 'setup_swiss_rounds', 'setup_round_robin_points', 'update_notifications',
+                'set_max_participants', 'set_private', 'update_ranking_order', 'update_website_options',
+                'update_pairing_method'}
+
+    def __init__(self, tournament):
+        self._tournament = tournament
+        self._params = {}
+        self._depth = 0
+
+    def __getattr__(self, name):
+        if name in self._helpers:
+            # run the helper with this batch as `self`, so that it calls our `update`
+            return getattr(Tournament, name).__get__(self)
+        return getattr(self._tournament, name)
+
+    async def update(self, **params):
+        """ record changes, see :func:`Tournament.update`
+
+        |methcoro|
+
+        """
+        assert_or_raise(all(k in Tournament._update_parameters for k in params.keys()),
+                        NameError,
+                        'Wrong parameter given')
+        self._params.update(params)
+
+    def batch_update(self):
+        """ this same batch, a nested block is merged with the outermost one """
+        return self
+
+    async def send(self):
+        """ send the recorded changes in one request, if there are any
+
+        |methcoro|
+
+        Raises:
+            APIException
+
+        """
+        params, self._params = self._params, {}
+        if params:
+            await self._tournament.update(**params)
+
+    def discard(self):
+        """ forget the recorded changes """
+        self._params = {}
+
+    async def __aenter__(self):
+        self._depth += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        if self._depth > 0:
+            return
+        if exc_type is None:
+            await self.send()
+        else:
+            self.discard()
+
+
+def _increasing_subsequence(values: list) -> set:
+    """ indexes of a longest strictly increasing subsequence of `values`, in O(n log n) """
+    tails = []      # index of the smallest tail of an increasing subsequence of each length
+    previous = [-1] * len(values)
+    tail_values = []
+    for i, v in enumerate(values):
+        k = bisect.bisect_left(tail_values, v)
+        if k > 0:
+            previous[i] = tails[k - 1]
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(v)
+        else:
+            tails[k] = i
+            tail_values[k] = v
+    kept = set()
+    i = tails[-1] if tails else -1
+    while i >= 0:
+        kept.add(i)
+        i = previous[i]
+    return kept
+
+
+def _seed_moves(current: list, target: list) -> list:
+    """ (participant, seed) changes turning the `current` seeding into `target`, as few as possible
+
+    Participants in a longest common subsequence of both orders never move. The others are
+    moved in target order, each one right after its predecessor in the target order:
+    a seed change removes the participant and bumps the following ones, like the API does.
+
+    """
+    position = {p: i for i, p in enumerate(current)}
+    kept = _increasing_subsequence([position[p] for p in target])
+    seeding = list(current)
+    moves = []
+    for i, p in enumerate(target):
+        if i in kept:
+            continue
+        old_index = seeding.index(p)
+        del seeding[old_index]
+        new_index = seeding.index(target[i - 1]) + 1 if i > 0 else 0
+        seeding.insert(new_index, p)
+        if new_index != old_index:
+            moves.append((p, new_index + 1))
+    return moves
+
+
 class Tournament(metaclass=FieldHolder):
     """ Representation of a Challonge tournament """
 
@@ -49,18 +172,58 @@ class Tournament(metaclass=FieldHolder):
         self.connection = connection
 
         self.participants = None
+        self._participant_index = None
         self._create_participant = lambda p: self._create_holder(Participant, p, tournament=self)
 
         self.matches = None
         self._create_match = lambda m: self._create_holder(Match, m, tournament=self)
         self._find_match = lambda m_id: self._find_holder(self.matches, m_id)
+        self._match_table = None
+        self._match_index = None
+        self._bracket_renderer = None
+
+        self._tournament_index = None
 
         self._refresh_from_json(json_def)
 
+    @property
+    def match_table(self) -> MatchTable:
+        """ columnar copy of :attr:`matches`, created on first use and then updated whenever a match is refreshed """
+        if self._match_table is None:
+            self._match_table = MatchTable(self.matches or ())
+        return self._match_table
+
+    @property
+    def participant_index(self) -> ParticipantNameIndex:
+        """ names of :attr:`participants` for searches, created on first use and then updated whenever a participant is refreshed """
+        if self._participant_index is None:
+            self._participant_index = ParticipantNameIndex(self.participants or ())
+        return self._participant_index
+
+    @property
+    def match_index(self) -> MatchIndex:
+        """ :attr:`matches` by round, group and state, created on first use and then updated whenever a match or participant is refreshed """
+        if self._match_index is None:
+            self._match_index = MatchIndex(self.matches or (), self.participants or ())
+        return self._match_index
+
+    @property
+    def bracket_renderer(self) -> BracketRenderer:
+        """ :class:`BracketRenderer` of :attr:`matches`, keeping what it rendered between two calls """
+        if self._bracket_renderer is None:
+            self._bracket_renderer = BracketRenderer(self)
+        return self._bracket_renderer
+
     def _find_participant(self, p_id):
         if self.participants is not None:
+            p = self.participants.find(int(p_id))
+            if p is not None:
+                return p
+            # group stage matches use the group player ids
+            if self._match_index is not None:
+                return self._match_index.find_participant(int(p_id))
             for p in self.participants:
-                if int(p_id) == p.id or int(p_id) in p.group_player_ids:
+                if int(p_id) in (p.group_player_ids or ()):
                     return p
         return None
 
@@ -73,36 +236,36 @@ class Tournament(metaclass=FieldHolder):
                 self._refresh_participants_from_json(t_data['participants'])
             if 'matches' in t_data:
                 self._refresh_matches_from_json(t_data['matches'])
+            if self._tournament_index is not None:
+                self._tournament_index.update(self)
 
     def _refresh_participants_from_json(self, participants_data):
         if self.participants is None:
-            self.participants = [self._create_participant(p_data) for p_data in participants_data]
+            self.participants = HolderList(self._create_participant(p_data) for p_data in participants_data)
         else:
             for p_data in participants_data:
-                for p in self.participants:
-                    if p_data['participant']['id'] == p._id:
-                        p._refresh_from_json(p_data)
-                        break
+                p = self.participants.find(p_data['participant']['id'])
+                if p is not None:
+                    p._refresh_from_json(p_data)
                 else:
                     self.participants.append(self._create_participant(p_data))
 
     def _refresh_matches_from_json(self, matches_data):
         if self.matches is None:
-            self.matches = [self._create_match(m_data) for m_data in matches_data]
+            self.matches = HolderList(self._create_match(m_data) for m_data in matches_data)
         else:
             for m_data in matches_data:
-                for m in self.matches:
-                    if m_data['match']['id'] == m._id:
-                        m._refresh_from_json(m_data)
-                        break
+                m = self.matches.find(m_data['match']['id'])
+                if m is not None:
+                    m._refresh_from_json(m_data)
                 else:
                     self.matches.append(self._create_match(m_data))
 
     def _add_participant(self, p: Participant):
         if p is not None:
             if self.participants is None:
-                self.participants = [p]
-            else:
+                self.participants = HolderList([p])
+            elif p not in self.participants:
                 self.participants.append(p)
 
     async def start(self):
@@ -192,6 +355,26 @@ class Tournament(metaclass=FieldHolder):
                                     **params)
         self._refresh_from_json(res)
 
+    def batch_update(self):
+        """ collect the changes made by :func:`update` and its helpers, and send them all in one request
+
+        The changes must be made on the returned batch, which has the same helpers as the tournament.
+        They are validated when the helpers are called, and sent when the block exits without an exception.
+        Until then, the local attributes are not updated. Nested blocks are merged with the outermost one::
+
+            async with tournament.batch_update() as batch:
+                await batch.update_name('New name')
+                await batch.set_private()
+                await batch.set_max_participants(32)
+
+        Without ``async with``, the changes are sent with ``batch.send()``.
+
+        Raises:
+            APIException
+
+        """
+        return _BatchUpdate(self)
+
     async def update_tournament_type(self, tournament_type: TournamentType):
         """
 
@@ -294,12 +477,7 @@ class Tournament(metaclass=FieldHolder):
 
         """
         date_time = datetime.strptime(date + ' ' + time, '%Y/%m/%d %H:%M')
-        res = await self.connection('PUT',
-                                    'tournaments/{}'.format(self._id),
-                                    'tournament',
-                                    start_at=date_time,
-                                    check_in_duration=check_in_duration or 0)
-        self._refresh_from_json(res)
+        await self.update(start_at=date_time, check_in_duration=check_in_duration or 0)
 
     async def update_double_elim_ending(self, ending: DoubleEliminationEnding):
         """ update the ending format for your Double Elimination tournament
@@ -526,7 +704,7 @@ class Tournament(metaclass=FieldHolder):
         """
         found_p = self._find_participant(p_id)
         if force_update or found_p is None:
-            await self.get_participants()
+            await self.get_participants(force_update=force_update)
             found_p = self._find_participant(p_id)
         return found_p
 
@@ -546,13 +724,15 @@ class Tournament(metaclass=FieldHolder):
 
         """
         if force_update or self.participants is None:
-            res = await self.connection('GET', 'tournaments/{}/participants'.format(self._id))
+            res = await self.connection('GET', 'tournaments/{}/participants'.format(self._id), use_cache=not force_update)
             self._refresh_participants_from_json(res)
         return self.participants or []
 
     async def search_participant(self, name, force_update=False):
         """ search a participant by (display) name
 
+        The name must match exactly, see :func:`search_participants` for a tolerant search.
+
         |methcoro|
 
         Args:
@@ -567,13 +747,40 @@ class Tournament(metaclass=FieldHolder):
 
         """
         if force_update or self.participants is None:
-            await self.get_participants()
-        if self.participants is not None:
-            for p in self.participants:
-                if p.name == name:
-                    return p
+            await self.get_participants(force_update=force_update)
+        # the index narrows the candidates down to the names equal once normalized
+        for p in self.participant_index.find(name):
+            if p.name == name:
+                return p
         return None
 
+    async def search_participants(self, text: str, limit: int = 10, prefix: bool = True, fuzzy: bool = True,
+                                  cutoff: float = 0.6, force_update=False) -> list:
+        """ search participants by name, display name or username, tolerating typos
+
+        See :func:`ParticipantNameIndex.search`.
+
+        |methcoro|
+
+        Args:
+            text: the searched name
+            limit: maximum number of participants returned
+            prefix (default=True): include the names starting with `text`
+            fuzzy (default=True): include the names similar to `text`
+            cutoff: minimum similarity of a fuzzy match, between 0 and 1
+            force_update (default=False): True to force an update to the Challonge API
+
+        Returns:
+            list[Participant]: best matches first
+
+        Raises:
+            APIException
+
+        """
+        if force_update or self.participants is None:
+            await self.get_participants(force_update=force_update)
+        return self.participant_index.search(text, limit, prefix, fuzzy, cutoff)
+
     async def add_participant(self, display_name: str = None, username: str = None, email: str = None, seed: int = 0, misc: str = None, **params):
         """ add a participant to the tournament
 
@@ -616,24 +823,78 @@ class Tournament(metaclass=FieldHolder):
         self._add_participant(new_p)
         return new_p
 
-    async def add_participants(self, *names: str) -> list:
-        """
+    async def add_participants(self, *participants, chunk_size: int = 100, concurrency: int = 1, resume: bool = False) -> list:
+        """ add many participants with `bulk_add` requests of `chunk_size` participants
 
         |methcoro|
 
-        Warnings:
-            |inprogress|
+        Each participant is either a display name or a dict with the same fields as :func:`add_participant`:
+        ``display_name``, ``username``, ``email``, ``seed``, ``misc`` and other API parameters.
+
+        When `concurrency` is more than 1, that many chunks are sent at the same time: the participants without
+        a `seed` may then not be seeded in the given order.
+        If a chunk fails, no other chunk is sent and a :class:`BulkAddError` tells which participants were created
+        (the chunks already in flight complete). Calling again with `resume` set to True only adds the participants
+        whose `misc` field is not found in the tournament, so giving each participant a unique `misc`
+        (e.g. the key to your users table) makes an import resumable.
+
+        Example::
+
+            await t.add_participants(*[{'display_name': u.name, 'misc': str(u.id)} for u in users], resume=True)
+
+        Args:
+            participants: display names or dicts of fields
+            chunk_size (default=100): participants per request
+            concurrency (default=1): maximum number of requests at the same time
+            resume (default=False): skip the participants whose `misc` is already used in the tournament
+
+        Returns:
+            list[Participant]: the participant of each given one, in the same order (already existing ones with `resume`),
+                None for the ones not created when exceptions are disabled
 
         Raises:
+            BulkAddError: a chunk failed
             APIException
 
         """
-        params = {'name': list(names)}
-        res = await self.connection('POST',
-                                    'tournaments/{}/participants/bulk_add'.format(self._id),
-                                    'participants[]',
-                                    **params)
-        self._refresh_participants_from_json(res)
+        items = []
+        for p in participants:
+            fields = dict(p) if isinstance(p, dict) else {'display_name': p}
+            fields['name'] = fields.pop('display_name', None) or fields.get('name') or ''
+            if 'username' in fields:
+                fields['challonge_username'] = fields.pop('username')
+            items.append(fields)
+
+        added = [None] * len(items)
+        if resume:
+            await self.get_participants(force_update=True)
+            by_misc = {p.misc: p for p in self.participants if p.misc}
+            for i, fields in enumerate(items):
+                added[i] = by_misc.get(fields.get('misc'))
+        todo = [i for i, p in enumerate(added) if p is None]
+
+        async def add_chunk(chunk):
+            keys = ['name'] + sorted({k for i in chunk for k in items[i]} - {'name'})
+            params = {k: [items[i].get(k) for i in chunk] for k in keys}
+            res = await self.connection('POST',
+                                        'tournaments/{}/participants/bulk_add'.format(self._id),
+                                        'participants[]',
+                                        **params)
+            if not _is_success(res):
+                # exceptions are disabled: run_bulk collects the error, the slots of the chunk stay None
+                return
+            self._refresh_participants_from_json(res)
+            for i, p_data in zip(chunk, res):
+                added[i] = self.participants.find(p_data['participant']['id'])
+
+        chunk_size = max(1, chunk_size)
+        chunks = [todo[k:k + chunk_size] for k in range(0, len(todo), chunk_size)]
+        result = await run_bulk(chunks, add_chunk, concurrency, stop_on_failure=True)
+        if result.failed:
+            created = sum(p is not None for p in added)
+            message = 'bulk_add failed after {} of {} participants: {!r}'.format(created, len(added), result.failed[0][1])
+            assert_or_raise(False, BulkAddError, message, added)
+        return added
 
     async def remove_participant(self, p: Participant):
         """ remove a participant from the tournament
@@ -648,8 +909,80 @@ class Tournament(metaclass=FieldHolder):
 
         """
         await self.connection('DELETE', 'tournaments/{}/participants/{}'.format(self._id, p._id))
-        if p in self.participants:
+        if self.participants is not None and p in self.participants:
             self.participants.remove(p)
+        if self._participant_index is not None:
+            self._participant_index.remove(p)
+        if self._match_index is not None:
+            self._match_index.remove_participant(p)
+
+    async def _bulk(self, participants, operation, concurrency: int) -> BulkResult:
+        result = await run_bulk(participants, operation, concurrency)
+        if result.succeeded:
+            await self.get_participants(force_update=True)
+        return result
+
+    async def check_in_participants(self, participants: list, concurrency: int = 8) -> BulkResult:
+        """ check in many participants, at most `concurrency` requests at the same time
+
+        |methcoro|
+
+        A failure does not stop the other check-ins. The participants are fetched once at the end.
+
+        Args:
+            participants: the participants to check in
+            concurrency (default=8): maximum number of requests at the same time
+
+        Returns:
+            BulkResult: the participants checked in and the failures
+
+        """
+        return await self._bulk(participants, lambda p: p.check_in(), concurrency)
+
+    async def undo_check_in_participants(self, participants: list, concurrency: int = 8) -> BulkResult:
+        """ undo the check-in of many participants, at most `concurrency` requests at the same time
+
+        |methcoro|
+
+        Args:
+            participants: the participants to mark as not checked in
+            concurrency (default=8): maximum number of requests at the same time
+
+        Returns:
+            BulkResult: the participants updated and the failures
+
+        """
+        return await self._bulk(participants, lambda p: p.undo_check_in(), concurrency)
+
+    async def rename_participants(self, names: dict, concurrency: int = 8) -> BulkResult:
+        """ change the display name of many participants, at most `concurrency` requests at the same time
+
+        |methcoro|
+
+        Args:
+            names: new display name of each participant
+            concurrency (default=8): maximum number of requests at the same time
+
+        Returns:
+            BulkResult: the participants renamed and the failures
+
+        """
+        return await self._bulk(list(names), lambda p: p.change_display_name(names[p]), concurrency)
+
+    async def remove_participants(self, participants: list, concurrency: int = 8) -> BulkResult:
+        """ remove many participants from the tournament, at most `concurrency` requests at the same time
+
+        |methcoro|
+
+        Args:
+            participants: the participants to remove
+            concurrency (default=8): maximum number of requests at the same time
+
+        Returns:
+            BulkResult: the participants removed and the failures
+
+        """
+        return await self._bulk(participants, self.remove_participant, concurrency)
 
     async def get_match(self, m_id, force_update=False) -> Match:
         """ get a single match by id
@@ -669,7 +1002,7 @@ class Tournament(metaclass=FieldHolder):
         """
         found_m = self._find_match(m_id)
         if force_update or found_m is None:
-            await self.get_matches()
+            await self.get_matches(force_update=force_update)
             found_m = self._find_match(m_id)
         return found_m
 
@@ -691,6 +1024,7 @@ class Tournament(metaclass=FieldHolder):
         if force_update or self.matches is None:
             res = await self.connection('GET',
                                         'tournaments/{}/matches'.format(self._id),
+                                        use_cache=not force_update,
                                         include_attachments=1)
             self._refresh_matches_from_json(res)
         return self.matches or []
@@ -710,6 +1044,70 @@ class Tournament(metaclass=FieldHolder):
         res = await self.connection('POST', 'tournaments/{}/participants/randomize'.format(self._id))
         self._refresh_participants_from_json(res)
 
+    async def apply_seeding(self, order: list, allow_rebuild: bool = False) -> int:
+        """ seed the participants in the given order with as few requests as possible
+
+        |methcoro|
+
+        The seed changes are computed from the current local seeds: participants that are already
+        in the right relative order are not touched, the others are moved with :func:`Participant.change_seed`.
+        When `allow_rebuild` is True and that would take more than two requests, all the participants are
+        deleted and added back in the new order with a single `bulk_add` instead.
+        The participants are then fetched once to get the new seeds.
+
+        Warning:
+            A rebuild creates new participants: their ids change and check-ins, invitations and emails are lost
+            (names, usernames and `misc` are kept).
+
+        Args:
+            order: participants (or their ids) from the first seed; those missing keep their relative order after them
+            allow_rebuild (default=False): allow the delete-and-`bulk_add` strategy
+
+        Returns:
+            int: number of requests sent to change the seeds
+
+        Raises:
+            ValueError: a participant is unknown or given twice
+            APIException
+
+        """
+        await self.get_participants()
+        target = []
+        for p in order:
+            found = self._find_participant(p if isinstance(p, int) else p.id)
+            assert_or_raise(found is not None, ValueError, 'Unknown participant: {}'.format(p))
+            target.append(found)
+        assert_or_raise(len(set(target)) == len(target), ValueError, 'Participants must be given only once')
+
+        current = sorted(self.participants, key=lambda p: (p.seed is None, p.seed or 0))
+        listed = set(target)
+        target.extend(p for p in current if p not in listed)
+        moves = _seed_moves(current, target)
+        if not moves:
+            return 0
+
+        if allow_rebuild and len(moves) > 2 and self._state in ('pending', 'checking_in', 'checked_in'):
+            await self.connection('DELETE', 'tournaments/{}/participants/clear'.format(self._id))
+            params = {
+                'name': [p.name or '' for p in target],
+                'challonge_username': [p.challonge_username or '' for p in target],
+                'misc': [p.misc or '' for p in target],
+            }
+            await self.connection('POST',
+                                  'tournaments/{}/participants/bulk_add'.format(self._id),
+                                  'participants[]',
+                                  **params)
+            self.participants = None
+            self._participant_index = None
+            self._match_index = None
+            await self.get_participants()
+            return 2
+
+        for p, seed in moves:
+            await p.change_seed(seed)
+        await self.get_participants(force_update=True)
+        return len(moves)
+
     async def process_check_ins(self):
         """ finalize the check in phase
 
@@ -1,6 +1,8 @@
 from . import AUTO_GET_PARTICIPANTS, AUTO_GET_MATCHES
-from .helpers import get_connection, assert_or_raise
+from .helpers import HolderList, get_connection, get_holder, assert_or_raise
 from .tournament import Tournament, TournamentType
+from .table import MatchTable
+from .index import TournamentIndex, search_participants
 
 
 class User:
@@ -8,32 +10,39 @@ class User:
 
     Main entry point for using the async challonge library.
 
+    Attributes:
+        tournaments: the tournaments fetched so far
+        tournament_index: :class:`TournamentIndex` of those tournaments
+
     """
 
     def __init__(self, username: str, api_key: str, **kwargs):
         self.tournaments = None
+        self.tournament_index = TournamentIndex()
         self.connection = get_connection(username, api_key, **kwargs)
         self._subdomains_searched = []
+        self._match_table = None
+        self._match_table_key = None
 
     def _refresh_tournament_from_json(self, tournament_data):
+        t = self.tournaments.find(tournament_data['tournament']['id']) if self.tournaments is not None else None
+        if t is not None:
+            # also updates the index
+            t._refresh_from_json(tournament_data)
+            return
+        t = self._create_tournament(tournament_data)
         if self.tournaments is None:
-            self.tournaments = [self._create_tournament(tournament_data)]
+            self.tournaments = HolderList([t])
         else:
-            for t in self.tournaments:
-                if tournament_data['tournament']['id'] == t._id:
-                    t._refresh_from_json(tournament_data)
-                    break
-            else:
-                self.tournaments.append(self._create_tournament(tournament_data))
+            self.tournaments.append(t)
+        self.tournament_index.update(t)
 
     def _create_tournament(self, json_def) -> Tournament:
-        return Tournament(self.connection, json_def)
+        return get_holder(self.connection, Tournament, json_def)
 
     def _find_tournament_by_id(self, e_id):
         if self.tournaments is not None:
-            for e in self.tournaments:
-                if e.id == int(e_id):
-                    return e
+            return self.tournaments.find(int(e_id))
         return None
 
     def _find_tournament_by_url(self, url, subdomain):
@@ -44,6 +53,48 @@ class User:
                         return e
         return None
 
+    @property
+    def match_table(self) -> MatchTable:
+        """ :attr:`Tournament.match_table` of all the known tournaments in one table
+
+        The table is kept and built again only once a tournament was added or removed or one of their tables changed.
+
+        """
+        tables = [t.match_table for t in self.tournaments or ()]
+        key = [(table, table.version) for table in tables]
+        if self._match_table is None or key != self._match_table_key:
+            self._match_table = MatchTable.concat(tables)
+            self._match_table_key = key
+        return self._match_table
+
+    def search_participants(self, text: str, limit: int = 10, prefix: bool = True, fuzzy: bool = True,
+                            cutoff: float = 0.6) -> list:
+        """ search participants by name in all the known tournaments whose participants have been fetched
+
+        Nothing is requested from the API. See :func:`ParticipantNameIndex.search`.
+
+        Args:
+            text: the searched name
+            limit: maximum number of participants returned
+            prefix (default=True): include the names starting with `text`
+            fuzzy (default=True): include the names similar to `text`
+            cutoff: minimum similarity of a fuzzy match, between 0 and 1
+
+        Returns:
+            list[Participant]: best matches first
+
+        """
+        indexes = [t.participant_index for t in self.tournaments or () if t.participants is not None]
+        return search_participants(indexes, text, limit, prefix, fuzzy, cutoff)
+
+    async def close(self):
+        """ close the HTTP session kept open when the user was created with `keep_alive=True`
+
+        |methcoro|
+
+        """
+        await self.connection.close()
+
     async def validate(self):
         """ checks whether the current user is connected
 
@@ -88,7 +139,7 @@ class User:
                     param = '{}-{}'.format(subdomain, url)
                 else:
                     param = url
-            res = await self.connection('GET', 'tournaments/{}'.format(param))
+            res = await self.connection('GET', 'tournaments/{}'.format(param), use_cache=not force_update)
             self._refresh_tournament_from_json(res)
             found_t = self._find_tournament_by_id(res['tournament']['id'])
 
@@ -110,6 +161,7 @@ class User:
             APIException
 
         """
+        use_cache = not force_update
         if self.tournaments is None:
             force_update = True
             self._subdomains_searched.append('' if subdomain is None else subdomain)
@@ -128,9 +180,10 @@ class User:
             if subdomain is not None:
                 params['subdomain'] = subdomain
 
-            res = await self.connection('GET', 'tournaments', **params)
+            res = await self.connection('GET', 'tournaments', use_cache=use_cache, **params)
             if len(res) == 0:
-                self.tournaments = []
+                if self.tournaments is None:
+                    self.tournaments = HolderList()
             else:
                 for t_data in res:
                     self._refresh_tournament_from_json(t_data)
@@ -177,8 +230,9 @@ class User:
 
         """
         await self.connection('DELETE', 'tournaments/{}'.format(t.id))
-        if t in self.tournaments:
+        if self.tournaments is not None and t in self.tournaments:
             self.tournaments.remove(t)
+        self.tournament_index.remove(t)
 
 
 async def get_user(username: str, api_key: str, **kwargs) -> User:
@@ -190,6 +244,11 @@ async def get_user(username: str, api_key: str, **kwargs) -> User:
         username: username as specified on the challonge website
         api_key: key as found on the challonge
             `settings <https://challonge.com/settings/developer>`_
+        timeout: *optional* total timeout of a request, in seconds
+        keep_alive: *optional* keep one HTTP session and its connection pool open until :func:`User.close`
+        pool_limit: *optional* maximum number of simultaneous connections in that pool
+        circuit_breaker: *optional* :class:`CircuitBreaker` failing requests fast while the API is degraded
+        cache: *optional* :class:`CacheStore` keeping the answers of GET requests
 
     Returns:
         User: a logged in user if no exception has been raised
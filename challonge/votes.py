@@ -0,0 +1,170 @@
+import asyncio
+import logging
+
+
+log = logging.getLogger('challonge')
+
+
+class VoteAccumulator:
+    """ Buffers vote increments for a :class:`Match` and sends them in one request per interval
+
+    :func:`add` only updates local counters; the first increment after a flush schedules the next one
+    `interval` seconds later. The votes sent are the last values known from Challonge plus the buffered increments,
+    so the accumulator should be the only writer of the match votes, or :func:`sync` should be called from time to time.
+    Call :func:`close` (or use ``async with``) to send what is left.
+
+    A scheduled flush that fails is retried with an exponential backoff (twice the interval, then four times...).
+    After `max_retries` retries the votes stay buffered and the error is raised by the next :func:`add`,
+    :func:`flush` or :func:`close`.
+
+    Usually obtained with :func:`Match.vote_accumulator`.
+
+    Args:
+        match: the match receiving the votes
+        interval: seconds between two flushes
+        max_retries: retries of a failed scheduled flush
+        metrics: *optional* :class:`Metrics` to which the votes sent and the requests are reported
+
+    Attributes:
+        votes_sent: number of votes sent so far
+        requests: number of requests that sent them
+        failures: failed scheduled flushes since the last successful one
+
+    """
+
+    def __init__(self, match, interval: float = 1.0, max_retries: int = 3, metrics=None):
+        self.match = match
+        self.interval = interval
+        self.max_retries = max_retries
+        self.metrics = metrics
+        self.votes_sent = 0
+        self.requests = 0
+        self.failures = 0
+        self._pending = [0, 0]
+        self._task = None
+        self._flushing = None
+        self._error = None
+
+    @property
+    def pending(self) -> tuple:
+        """ (player1, player2) increments not sent yet """
+        return tuple(self._pending)
+
+    @property
+    def votes_per_request(self) -> float:
+        """ average number of votes sent per request so far """
+        return self.votes_sent / self.requests if self.requests else 0.0
+
+    def stats(self) -> dict:
+        return {
+            'votes_sent': self.votes_sent,
+            'requests': self.requests,
+            'votes_per_request': self.votes_per_request,
+            'pending': self.pending,
+        }
+
+    def add(self, player1: int = 0, player2: int = 0):
+        """ buffer vote increments, a flush is scheduled if none is
+
+        Raises:
+            APIException: the scheduled flushes failed too many times, the increments are not buffered
+
+        """
+        self._raise_error()
+        self._pending[0] += player1
+        self._pending[1] += player2
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._flush_later(self.interval))
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    async def _flush_later(self, delay: float):
+        try:
+            await asyncio.sleep(delay)
+            self._task = None
+            await self.flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            if self.failures > self.max_retries:
+                log.error('Votes of match {} could not be sent after {} attempts: {}'.format(self.match._id, self.failures, e))
+                self.failures = 0
+                self._error = e
+            else:
+                log.warning('Votes of match {} could not be sent: {}'.format(self.match._id, e))
+                if self._task is None and any(self._pending):
+                    self._task = asyncio.ensure_future(self._flush_later(self.interval * 2 ** self.failures))
+
+    async def flush(self):
+        """ send the buffered votes now
+
+        |methcoro|
+
+        Raises:
+            APIException: also when the scheduled flushes failed too many times
+
+        """
+        self._raise_error()
+        while self._flushing is not None:
+            await self._flushing
+        if not any(self._pending):
+            return
+
+        pending, self._pending = self._pending, [0, 0]
+        params = {}
+        if pending[0]:
+            params['player1_votes'] = (self.match._player1_votes or 0) + pending[0]
+        if pending[1]:
+            params['player2_votes'] = (self.match._player2_votes or 0) + pending[1]
+
+        self._flushing = asyncio.ensure_future(self.match.change_votes(**params))
+        try:
+            await self._flushing
+        except Exception:
+            self._pending[0] += pending[0]
+            self._pending[1] += pending[1]
+            raise
+        finally:
+            self._flushing = None
+        self.failures = 0
+        self.requests += 1
+        self.votes_sent += pending[0] + pending[1]
+        if self.metrics is not None:
+            self.metrics.record_votes(pending[0] + pending[1])
+
+    async def sync(self):
+        """ fetch the current votes from Challonge, they become the base the increments are added to
+
+        |methcoro|
+
+        Raises:
+            APIException
+
+        """
+        res = await self.match.connection('GET', 'tournaments/{}/matches/{}'.format(self.match._tournament_id, self.match._id),
+                                          use_cache=False)
+        self.match._refresh_from_json(res)
+
+    async def close(self):
+        """ cancel the scheduled flush and send the buffered votes
+
+        |methcoro|
+
+        Raises:
+            APIException
+
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
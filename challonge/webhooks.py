@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import socket
+
+import aiohttp
+from aiohttp import web
+
+from .helpers import APIException
+
+
+log = logging.getLogger('challonge')
+
+DEFAULT_SIGNATURE_HEADER = 'X-Challonge-Signature'
+
+
+def sign(body: bytes, secret: str) -> str:
+    """ HMAC-SHA256 signature of a webhook body, as a hex string """
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+async def send_event(url: str, payload, secret: str = None, signature_header: str = DEFAULT_SIGNATURE_HEADER) -> int:
+    """ post `payload` as JSON to a :class:`WebhookReceiver`, signed with `secret`, like Challonge would
+
+    |funccoro|
+
+    Returns:
+        int: the HTTP status of the answer
+
+    """
+    body = json.dumps(payload).encode()
+    headers = {'Content-Type': 'application/json'}
+    if secret is not None:
+        headers[signature_header] = sign(body, secret)
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, data=body, headers=headers) as response:
+            return response.status
+
+
+class WebhookReceiver:
+    """ HTTP endpoint receiving Challonge webhook callbacks and applying them to the cached models of `user`
+
+    A callback body is a tournament, match or participant as the API returns it (e.g. ``{"match": {...}}``),
+    or a list of them. It is applied to the :class:`Tournament`, :class:`Match` or :class:`Participant`
+    already known by `user`, the same way an API answer is; events about unknown tournaments are ignored.
+    Matches and participants are only added to a tournament whose matches or participants have been fetched.
+
+    When a `secret` is given, the body must be signed with it (:func:`sign`) in the `signature_header` header,
+    otherwise the callback is rejected with a 401.
+
+    Tournaments given to :func:`watch` are polled when no event about them has arrived for `fallback_interval` seconds.
+
+    Example::
+
+        async with WebhookReceiver(user, secret='s3cr3t', port=8080) as receiver:
+            receiver.watch(tournament)
+            receiver.add_listener(lambda kind, model: print(kind, model.id))
+            ...
+
+    Args:
+        user: the :class:`User` whose tournaments are updated
+        secret: *optional* key of the HMAC-SHA256 signature of the bodies
+        host: interface to bind
+        port: port to bind, 0 picks a free one
+        path: path of the endpoint
+        fallback_interval: seconds without event after which a watched tournament is polled, None to never poll
+        signature_header: name of the header holding the signature
+
+    """
+
+    def __init__(self, user, secret: str = None, host: str = '127.0.0.1', port: int = 0, path: str = '/challonge',
+                 fallback_interval: float = 60.0, signature_header: str = DEFAULT_SIGNATURE_HEADER):
+        self.user = user
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.path = path
+        self.fallback_interval = fallback_interval
+        self.signature_header = signature_header
+
+        self.received = 0
+        self.rejected = 0
+        self.applied = 0
+        self.polls = 0
+
+        self._listeners = []
+        self._last_event = {}
+        self._runner = None
+        self._poller = None
+
+    @property
+    def url(self) -> str:
+        """ url to register as webhook """
+        return 'http://{}:{}{}'.format(self.host, self.port, self.path)
+
+    def add_listener(self, callback):
+        """ call ``callback(kind, model)`` after each applied event, `kind` being ``tournament``, ``match`` or ``participant``
+
+        Polls are reported too, as a ``tournament`` event.
+
+        """
+        self._listeners.append(callback)
+
+    def watch(self, tournament):
+        """ poll `tournament` when no event about it arrives for :attr:`fallback_interval` seconds """
+        self._last_event[tournament.id] = asyncio.get_event_loop().time()
+
+    def unwatch(self, tournament):
+        self._last_event.pop(tournament.id, None)
+
+    # ------------------------------------------------------------------
+    # lifecycle
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        return app
+
+    async def start(self):
+        """ start serving in the running event loop, and polling the watched tournaments
+
+        |methcoro|
+
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        await web.SockSite(self._runner, sock).start()
+        if self.fallback_interval is not None:
+            self._poller = asyncio.ensure_future(self._poll_forever())
+        return self
+
+    async def stop(self):
+        """ stop serving and polling
+
+        |methcoro|
+
+        """
+        if self._poller is not None:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    # ------------------------------------------------------------------
+    # events
+
+    def verify(self, body: bytes, signature: str) -> bool:
+        """ whether `signature` is the signature of `body`, always True without secret """
+        if self.secret is None:
+            return True
+        if not signature:
+            return False
+        if signature.startswith('sha256='):
+            signature = signature[len('sha256='):]
+        return hmac.compare_digest(sign(body, self.secret), signature)
+
+    async def _handle(self, request):
+        self.received += 1
+        body = await request.read()
+        if not self.verify(body, request.headers.get(self.signature_header)):
+            self.rejected += 1
+            return web.json_response({'errors': ['Invalid signature']}, status=401)
+        try:
+            payload = json.loads(body.decode())
+        except ValueError:
+            self.rejected += 1
+            return web.json_response({'errors': ['Invalid JSON']}, status=400)
+        self.apply(payload)
+        return web.json_response({'status': 'ok'})
+
+    def apply(self, payload) -> int:
+        """ apply an event body to the cached models
+
+        Returns:
+            int: number of models updated
+
+        """
+        items = payload if isinstance(payload, list) else [payload]
+        applied = 0
+        for item in items:
+            model = None
+            if not isinstance(item, dict):
+                continue
+            if 'tournament' in item:
+                kind = 'tournament'
+                model = self.user._find_tournament_by_id(item['tournament']['id'])
+                if model is not None:
+                    model._refresh_from_json(item)
+                    t_id = model.id
+            elif 'match' in item or 'participant' in item:
+                kind = 'match' if 'match' in item else 'participant'
+                t_id = item[kind].get('tournament_id')
+                t = self.user._find_tournament_by_id(t_id) if t_id is not None else None
+                if t is not None and kind == 'match' and t.matches is not None:
+                    t._refresh_matches_from_json([item])
+                    model = t.matches.find(item['match']['id'])
+                elif t is not None and kind == 'participant' and t.participants is not None:
+                    t._refresh_participants_from_json([item])
+                    model = t.participants.find(item['participant']['id'])
+            if model is None:
+                log.debug('webhook event ignored: {}'.format(list(item)))
+                continue
+            applied += 1
+            if t_id in self._last_event:
+                self._last_event[t_id] = asyncio.get_event_loop().time()
+            for callback in self._listeners:
+                callback(kind, model)
+        self.applied += applied
+        return applied
+
+    # ------------------------------------------------------------------
+    # polling fallback
+
+    async def _poll(self, t_id):
+        res = await self.user.connection('GET', 'tournaments/{}'.format(t_id), use_cache=False,
+                                         include_participants=1, include_matches=1)
+        self.polls += 1
+        self.user._refresh_tournament_from_json(res)
+        t = self.user._find_tournament_by_id(t_id)
+        for callback in self._listeners:
+            callback('tournament', t)
+
+    async def _poll_forever(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            now = loop.time()
+            due = [t_id for t_id, last in self._last_event.items() if now - last >= self.fallback_interval]
+            for t_id in due:
+                self._last_event[t_id] = now
+                try:
+                    await self._poll(t_id)
+                except (APIException, asyncio.TimeoutError, aiohttp.ClientError, OSError) as e:
+                    log.warning('polling tournament {} failed: {!r}'.format(t_id, e))
+            next_due = min(self._last_event.values(), default=now) + self.fallback_interval
+            await asyncio.sleep(max(next_due - loop.time(), 0.01))
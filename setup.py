@@ -32,10 +32,11 @@ setup(name='achallonge',
       author='Fabien Poupineau (fp12)',
       url='https://github.com/fp12/achallonge',
 
-      packages=find_packages(),
+      packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
       install_requires=requirements,
       extras_require={
-        'speed':  ['cchardet', 'aiodns']
+        'speed':  ['cchardet', 'aiodns'],
+        'parquet': ['pyarrow']
       },
 
       include_package_data=True,